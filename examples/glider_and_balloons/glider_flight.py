@@ -40,8 +40,8 @@ with client.RenderContext() as ctx:
             origin.longitude + 8e-3 * np.random.normal(),
             origin.height_m + 100 * np.random.normal()) for _ in range(num_balloons)]
     
-    for i, name in enumerate(rolenames):
-        ctx.spawn_gameobject(unity.GameObject(name, choice(balloons)), geocoordinate=geocoordinates[i])
+    # One round trip for all balloons
+    ctx.spawn_gameobjects([unity.GameObject(name, choice(balloons)) for name in rolenames], geocoordinates=geocoordinates)
 
     u = 1e-5 * np.random.normal(size = num_balloons) + 1e-6
     v = 1e-5 * np.random.normal(size = num_balloons) + + 1e-6
@@ -1,5 +1,25 @@
-from .actor_state import ActorState, get_aircraft_state_from_fdm
+from .zmq_context import (
+    configure_context,
+    get_context,
+    create_socket,
+    terminate_context,
+    SharedContext)
+from .actor_state import (
+    ActorState,
+    TelemetrySchema,
+    register_telemetry_schema,
+    get_telemetry_schema,
+    get_aircraft_state_from_fdm)
 from .simulation_state import SimulationState
+from .wire_format import WireFormat
+from .columnar_state import ColumnarSimulationState
+from .delta import DeltaEncoder, DeltaDecoder
+from .lazy_state import LazySimulationState
 
-from .sim_state_pubsub import Publisher, Subscriber
+from .sim_state_pubsub import Publisher, Subscriber, DeliveryPolicy, DeliveryStats
+from .async_pubsub import AsyncPublisher, AsyncSubscriber
+from .recording import StateRecorder, StateLogReader
+from .replay import Replayer
+from .broker import Broker, TopicStats
+from .stream_metrics import StreamMetrics
 from . import unityapi
\ No newline at end of file
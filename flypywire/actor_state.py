@@ -1,11 +1,71 @@
 from __future__ import annotations
+import sys
 import orjson
 from math import isnan
+from typing import Dict, Iterable, Optional, Tuple, Union
 from jsbsim import FGFDMExec
 from flypywire.jsbsim_fdm import properties as prp
 
+POSE_KEYS = ('Latitude', 'Longitude', 'AltitudeMeters', 'RollRad', 'PitchRad', 'YawRad')
+_POSE_KEY_SET = frozenset(POSE_KEYS)
+
+
+class TelemetrySchema:
+
+    __slots__ = ('actor_type', 'fields', 'positions')
+
+    def __init__(self, actor_type: str, fields: Iterable[str]):
+
+        self.actor_type = sys.intern(actor_type)
+        self.fields: Tuple[str, ...] = tuple(sys.intern(field) for field in fields)
+        self.positions: Dict[str, int] = {field: idx for idx, field in enumerate(self.fields)}
+
+    def __repr__(self) -> str:
+        return f'TelemetrySchema({self.actor_type}: {", ".join(self.fields)})'
+
+    def pack(self, additional_data: dict) -> tuple:
+        return tuple(additional_data.get(field) for field in self.fields)
+
+    def unpack(self, telemetry: tuple) -> dict:
+        return dict(zip(self.fields, telemetry))
+
+
+_telemetry_schemas: Dict[str, TelemetrySchema] = {}
+_telemetry_schemas_by_fields: Dict[Tuple[str, ...], TelemetrySchema] = {}
+
+
+def register_telemetry_schema(actor_type: str, fields: Iterable[str]) -> TelemetrySchema:
+
+    schema = TelemetrySchema(actor_type, fields)
+    _telemetry_schemas[schema.actor_type] = schema
+    _telemetry_schemas_by_fields[schema.fields] = schema
+
+    return schema
+
+
+def get_telemetry_schema(actor_type: str) -> TelemetrySchema:
+
+    if actor_type not in _telemetry_schemas:
+        raise KeyError(f'Unknown telemetry schema "{actor_type}". Call register_telemetry_schema() on both ends of the stream.')
+
+    return _telemetry_schemas[actor_type]
+
+
 class ActorState:
 
+    # Extra fields are held either as a registered schema plus a positional
+    # telemetry tuple, or as a free-form dict; never both.
+    __slots__ = (
+        'latitude',
+        'longitude',
+        'height_m',
+        'roll_rad',
+        'pitch_rad',
+        'yaw_rad',
+        'schema',
+        'telemetry',
+        '_additional_data')
+
     def __init__(self,
         latitude: float,
         longitude: float,
@@ -21,29 +81,96 @@ class ActorState:
         self.roll_rad = roll_rad
         self.pitch_rad = pitch_rad
         self.yaw_rad = yaw_rad
-        self.additional_data = additional_data
+        self.schema: Optional[TelemetrySchema] = None
+        self.telemetry: tuple = ()
+        self._additional_data: Optional[dict] = additional_data
         
     def __repr__(self) -> str:
         return "".join(["ActorState:","\n", self.dumps()])
 
+    @staticmethod
+    def from_telemetry(
+        schema: Union[str, TelemetrySchema],
+        latitude: float,
+        longitude: float,
+        height_m: float,
+        roll_rad: float,
+        pitch_rad: float,
+        yaw_rad: float,
+        telemetry: tuple) -> ActorState:
+
+        actor_state = ActorState(latitude, longitude, height_m, roll_rad, pitch_rad, yaw_rad)
+        actor_state.schema = get_telemetry_schema(schema) if isinstance(schema, str) else schema
+        actor_state.telemetry = tuple(telemetry)
+        actor_state._additional_data = None
+
+        return actor_state
+
+    @staticmethod
+    def from_wire_extras(
+        latitude: float,
+        longitude: float,
+        height_m: float,
+        roll_rad: float,
+        pitch_rad: float,
+        yaw_rad: float,
+        extras: Union[None, dict, list] = None) -> ActorState:
+
+        if isinstance(extras, list):
+            actor_type, telemetry = extras
+            return ActorState.from_telemetry(actor_type, latitude, longitude, height_m, roll_rad, pitch_rad, yaw_rad, telemetry)
+
+        return ActorState(latitude, longitude, height_m, roll_rad, pitch_rad, yaw_rad, **(extras or {}))
+
+    @property
+    def additional_data(self) -> dict:
+
+        if self._additional_data is None:
+            self._additional_data = self.schema.unpack(self.telemetry)
+            self.schema = None
+            self.telemetry = ()
+
+        return self._additional_data
+
+    @additional_data.setter
+    def additional_data(self, additional_data: dict) -> None:
+
+        self._additional_data = additional_data
+        self.schema = None
+        self.telemetry = ()
+
+    def get(self, key: str, default = None):
+
+        if self.schema is not None:
+            position = self.schema.positions.get(key)
+            return default if position is None else self.telemetry[position]
+
+        return self._additional_data.get(key, default)
+
+    def wire_extras(self) -> Union[None, dict, list]:
+
+        if self.schema is not None:
+            return [self.schema.actor_type, self.telemetry]
+
+        return self._additional_data or None
+
     @staticmethod
     def deserialize_dict(actor_state_dict: dict) -> ActorState:
         
-        actor_state = ActorState(
-            actor_state_dict["Latitude"],
-            actor_state_dict["Longitude"],
-            actor_state_dict["AltitudeMeters"],
-            actor_state_dict["RollRad"],
-            actor_state_dict["PitchRad"],
-            actor_state_dict["YawRad"])
+        pose = [actor_state_dict[key] for key in POSE_KEYS]
+        extra_keys = tuple([key for key in actor_state_dict if key not in _POSE_KEY_SET])
         
-        actor_state.additional_data = dict([(key, actor_state_dict[key])\
-            for key in list(actor_state_dict.keys())[6:]])
+        schema = _telemetry_schemas_by_fields.get(extra_keys)
+        if schema is not None:
+            return ActorState.from_telemetry(schema, *pose, [actor_state_dict[key] for key in schema.fields])
         
-        return actor_state
+        return ActorState(*pose, **{key: actor_state_dict[key] for key in extra_keys})
 
 
     def to_dict(self) -> dict:
+        
+        extras = self.schema.unpack(self.telemetry) if self.schema is not None else self._additional_data
+        
         return {
             'Latitude': self.latitude,
             'Longitude': self.longitude,
@@ -51,7 +178,7 @@ class ActorState:
             'RollRad': self.roll_rad,
             "PitchRad": self.pitch_rad,
             "YawRad": self.yaw_rad,
-            **self.additional_data
+            **extras
         }        
         
 
@@ -0,0 +1,98 @@
+from __future__ import annotations
+import asyncio
+import logging
+import zmq
+import zmq.asyncio
+from typing import Union
+
+from flypywire import SimulationState, ColumnarSimulationState
+from flypywire.lazy_state import LazySimulationState
+from flypywire.sim_state_pubsub import Publisher, Subscriber, DeliveryPolicy
+from flypywire.zmq_context import create_async_socket
+from flypywire.shm_transport import is_shm_address
+
+
+class AsyncPublisher(Publisher):
+
+    def __str__(self) -> str:
+
+        return f'AsyncPublisher(address: {self.address})'
+
+    def _create_socket(self, socket_type: int) -> zmq.asyncio.Socket:
+
+        # The shared-memory ring has no file descriptor for the event loop to wait on
+        if is_shm_address(self.host):
+            raise ValueError(f'{type(self).__name__} does not support the shared-memory transport (shm://); use the threaded class instead.')
+
+        return create_async_socket(socket_type, owner = self)
+
+    async def publish_simulation_state(self, state: Union[SimulationState, ColumnarSimulationState]) -> None:
+
+        for msg in self._messages(state):
+            await self.socket.send_multipart(msg)
+
+        for hook in self.hooks: hook(state)
+
+        if self.debug: logging.info(msg = f'Publishing SimulationState:\n{state.dumps()}')
+
+
+class AsyncSubscriber(Subscriber):
+
+    # Messages are received on the event loop instead of a listener thread:
+    #   async for state in subscriber: ...
+
+    def __str__(self) -> str:
+
+        return f'AsyncSubscriber(address: {self.address})'
+
+    def _create_socket(self, socket_type: int) -> zmq.asyncio.Socket:
+
+        # The shared-memory ring has no file descriptor for the event loop to wait on
+        if is_shm_address(self.host):
+            raise ValueError(f'{type(self).__name__} does not support the shared-memory transport (shm://); use the threaded class instead.')
+
+        return create_async_socket(socket_type, owner = self)
+
+    def start_listening(self) -> None:
+        raise RuntimeError('AsyncSubscriber has no listener thread; await recv_simulation_state() or iterate with "async for".')
+
+    async def _rcv_available_msgs(self) -> None:
+
+        while not (self.delivery_policy == DeliveryPolicy.BLOCK and self._buffer_full) and await self.socket.poll(0):
+            self._handle_frames(await self.socket.recv_multipart())
+
+    async def recv_simulation_state(self) -> Union[SimulationState, LazySimulationState]:
+
+        waiting = False
+
+        while not self.is_data_available:
+
+            if self._stop_event.is_set():
+                raise RuntimeError(f'{self} is closed.')
+
+            if not await self.socket.poll(self.timeout_secs * 1000):
+                if not waiting: logging.info(msg = 'Waiting for connection...')
+                waiting = True
+                if self.on_timeout: self.on_timeout(self)
+                continue
+
+            if waiting and self.on_reconnect: self.on_reconnect(self)
+            waiting = False
+
+            # Drain everything already queued so the newest state is returned
+            await self._rcv_available_msgs()
+
+        return self.get_simulation_state()
+
+    def __aiter__(self) -> AsyncSubscriber:
+        return self
+
+    async def __anext__(self) -> Union[SimulationState, LazySimulationState]:
+
+        try:
+            return await self.recv_simulation_state()
+
+        except (RuntimeError, zmq.error.ZMQError, asyncio.CancelledError):
+            # close() cancels a pending poll on the socket
+            if self._stop_event.is_set(): raise StopAsyncIteration
+            raise
@@ -0,0 +1,251 @@
+from __future__ import annotations
+import argparse
+import logging
+import time
+import zmq
+from threading import Thread, Event
+from typing import Dict, List, Optional, Tuple
+
+from flypywire.simulation_state import SimulationState
+from flypywire.delta import DeltaDecoder
+from flypywire.wire_format import ACTOR_TOPIC_PREFIX, FLAG_KEYFRAME, FRAME_TOPIC, replay_frame, split_stamp
+from flypywire.zmq_context import create_socket
+
+# Forwarding broker between many publishers and many subscribers:
+#
+#   Publisher(connect = True) --> frontend (XSUB)  ==>  backend (XPUB) --> Subscriber
+#
+# Subscriptions flow upstream, so publishers only send topics someone listens to.
+# With last_value_cache enabled the broker subscribes to everything upstream, keeps the
+# latest message per topic and replays it to every new subscription, so late joiners get
+# a full state at once, even the first one. Per-actor topic subscribers subscribe to the
+# frame marker last, so their whole frame is replayed then, under one replay id.
+# Replays are tagged with a numbered REPLAY frame, so the subscribers that did not ask
+# for one can drop it. Delta streams are decoded by the broker and cached as a fresh keyframe.
+#
+# XSUB does not tell publishers apart, so the cache and the delta decoders are kept per
+# publisher id, taken from the message stamps: with several publishers, publish with
+# stamp_messages = True. Unstamped messages all count as one publisher. A publisher's
+# cache is forgotten once it has been silent for cache_expiry_s.
+
+SUBSCRIBE = 1
+UNSUBSCRIBE = 0
+
+
+class TopicStats:
+
+    def __init__(self):
+
+        self.subscriptions = 0
+        self.messages = 0
+        self.bytes = 0
+        self.cache_hits = 0
+        self.last_forward_time: Optional[float] = None
+
+    def __repr__(self) -> str:
+        return (
+            f'TopicStats(subscriptions: {self.subscriptions}, messages: {self.messages}, '
+            f'bytes: {self.bytes}, cache_hits: {self.cache_hits})')
+
+
+class Broker:
+
+    def __init__(self,
+        frontend: str = 'tcp://*:5555',
+        backend: str = 'tcp://*:5557',
+        last_value_cache: bool = True,
+        cache_expiry_s: float = 10.0,
+        poll_timeout_ms: int = 100,
+        debug: bool = False):
+
+        self.frontend_address = frontend
+        self.backend_address = backend
+        self.last_value_cache = last_value_cache
+        self.cache_expiry_s = cache_expiry_s
+        self.poll_timeout_ms = poll_timeout_ms
+        self.debug = debug
+
+        self.frontend = create_socket(zmq.XSUB, owner = self)
+        self.frontend.bind(frontend)
+
+        # The cache must see every topic before anyone subscribes to it
+        if last_value_cache: self.frontend.send(bytes([SUBSCRIBE]))
+
+        self.backend = create_socket(zmq.XPUB, owner = self)
+        # Report every subscription and unsubscription, not only the first and last per topic,
+        # so each new subscriber gets the cache and the subscription counts come back down
+        self.backend.setsockopt(zmq.XPUB_VERBOSER, 1)
+        self.backend.bind(backend)
+
+        self.stats: Dict[bytes, TopicStats] = {}
+        self.cache: Dict[Tuple[int, bytes], List[bytes]] = {}
+        self._delta_decoders: Dict[int, DeltaDecoder] = {}
+        self._last_seen: Dict[int, float] = {}
+        self._replays = 0
+
+        self._stop_event = Event()
+        self._thread: Optional[Thread] = None
+
+    def __str__(self) -> str:
+        return f'Broker(frontend: {self.frontend_address}, backend: {self.backend_address})'
+
+    def __enter__(self) -> Broker:
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        self.close()
+
+    def _topic_stats(self, topic: bytes) -> TopicStats:
+        return self.stats.setdefault(topic, TopicStats())
+
+    def _cache_message(self, publisher_id: int, topic: bytes, msg: List[bytes]) -> None:
+
+        payload = msg[-1]
+        self._last_seen[publisher_id] = time.monotonic()
+
+        if DeltaDecoder.is_delta_stream(payload):
+            state = self._delta_decoders.setdefault(publisher_id, DeltaDecoder()).apply(payload)
+            if state is None: return
+            msg = [*msg[:-1], SimulationState(state.timestamp, state.actors).dumpb(FLAG_KEYFRAME)]
+
+        self.cache[(publisher_id, topic)] = msg
+
+    def _expire_cache(self) -> None:
+
+        expired = {
+            publisher_id for publisher_id, last_seen in self._last_seen.items()
+            if time.monotonic() - last_seen > self.cache_expiry_s}
+        
+        if not expired: return
+
+        self.cache = {key: msg for key, msg in self.cache.items() if key[0] not in expired}
+        for publisher_id in expired:
+            del self._last_seen[publisher_id]
+            self._delta_decoders.pop(publisher_id, None)
+
+    def _forward_message(self, msg: List[bytes]) -> None:
+
+        self.backend.send_multipart(msg)
+
+        # Single-frame messages belong to the empty topic; per-actor topic streams carry the topic first.
+        # Stamps are not cached: a replayed stamp would look like a duplicate to the subscriber.
+        msg, stamp = split_stamp(msg)
+        topic = msg[0] if len(msg) > 1 else b''
+        publisher_id = stamp[0] if stamp is not None else 0
+
+        stats = self._topic_stats(topic)
+        stats.messages += 1
+        stats.bytes += sum(len(frame) for frame in msg)
+        stats.last_forward_time = time.monotonic()
+
+        if self.last_value_cache: self._cache_message(publisher_id, topic, msg)
+
+    def _cached_messages(self, prefixes: Tuple[bytes, ...]) -> List[List[bytes]]:
+
+        self._expire_cache()
+
+        # Grouped by publisher; the frame marker closes a per-actor frame, so it goes after the actor topics
+        keys = sorted(
+            (key for key in self.cache if key[1].startswith(prefixes)),
+            key = lambda key: (key[0], key[1] == FRAME_TOPIC))
+
+        self._replays += 1
+        replay = replay_frame(self._replays)
+
+        return [[*self.cache[key], replay] for key in keys]
+
+    def _replay_prefixes(self, topic: bytes) -> Tuple[bytes, ...]:
+
+        # Actor topics are replayed with their frame marker, which per-actor subscribers subscribe to last
+        if topic.startswith(ACTOR_TOPIC_PREFIX): return ()
+        if topic == FRAME_TOPIC: return (ACTOR_TOPIC_PREFIX, FRAME_TOPIC)
+
+        return (topic,)
+
+    def _handle_subscription(self, event: bytes) -> None:
+
+        # With the cache on, the broker already subscribes to everything and keeps that subscription
+        if not self.last_value_cache: self.frontend.send(event)
+
+        action, topic = event[0], event[1:]
+        stats = self._topic_stats(topic)
+
+        if action == UNSUBSCRIBE:
+            stats.subscriptions = max(stats.subscriptions - 1, 0)
+            return
+
+        stats.subscriptions += 1
+
+        if self.last_value_cache:
+            # XPUB cannot address one subscriber: current subscribers of the topic get the replay too and drop it
+            for msg in self._cached_messages(self._replay_prefixes(topic)):
+                self.backend.send_multipart(msg)
+                stats.cache_hits += 1
+
+        if self.debug: logging.info(msg = f'{self}: new subscription to {topic!r}')
+
+    def run(self) -> None:
+
+        poller = zmq.Poller()
+        poller.register(self.frontend, zmq.POLLIN)
+        poller.register(self.backend, zmq.POLLIN)
+
+        logging.info(msg = f'Running {self}')
+
+        while not self._stop_event.is_set():
+            try:
+                events = dict(poller.poll(self.poll_timeout_ms))
+
+            except zmq.ZMQError:
+                break
+
+            if self.backend in events:
+                self._handle_subscription(self.backend.recv())
+
+            if self.frontend in events:
+                self._forward_message(self.frontend.recv_multipart())
+
+    def start(self) -> None:
+
+        self._thread = Thread(target = self.run, daemon = True)
+        self._thread.start()
+
+    def close(self) -> None:
+
+        self._stop_event.set()
+        if self._thread is not None: self._thread.join()
+
+        self.frontend.close()
+        self.backend.close()
+        logging.info(msg = f'Closing {self}')
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+
+    parser = argparse.ArgumentParser(description = 'flypywire pub/sub broker')
+    parser.add_argument('--frontend', default = 'tcp://*:5555', help = 'address publishers connect to')
+    parser.add_argument('--backend', default = 'tcp://*:5557', help = 'address subscribers connect to')
+    parser.add_argument('--no-cache', action = 'store_true', help = 'disable the last-value cache')
+    parser.add_argument('--cache-expiry', type = float, default = 10.0, help = 'forget the cache of a publisher silent for N seconds')
+    parser.add_argument('--stats-interval', type = float, default = 0, help = 'log topic statistics every N seconds')
+    parser.add_argument('--debug', action = 'store_true')
+    args = parser.parse_args(argv)
+
+    broker = Broker(args.frontend, args.backend, not args.no_cache, args.cache_expiry, debug = args.debug)
+    broker.start()
+
+    try:
+        while broker._thread.is_alive():
+            broker._thread.join(args.stats_interval or 1.0)
+            if args.stats_interval:
+                for topic, stats in broker.stats.items(): logging.info(msg = f'{topic!r}: {stats}')
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        broker.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+from __future__ import annotations
+import orjson
+import numpy as np
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional
+from flypywire.actor_state import ActorState
+from flypywire.simulation_state import SimulationState, ActorName
+from flypywire.wire_format import (
+    WireFormat,
+    BINARY_MAGIC,
+    BINARY_VERSION,
+    NAME_SEPARATOR,
+    HEADER,
+    POSE_RECORD,
+    is_binary,
+    read_header)
+
+# Same memory layout as wire_format.POSE_RECORD, so binary messages map straight onto the array.
+ACTOR_RECORD = np.dtype([
+    ('name_idx', '<u4'),
+    ('lat', '<f8'),
+    ('lon', '<f8'),
+    ('height', '<f8'),
+    ('roll', '<f8'),
+    ('pitch', '<f8'),
+    ('yaw', '<f8')])
+
+assert ACTOR_RECORD.itemsize == POSE_RECORD.size
+
+
+class ActorsView(Mapping):
+
+    def __init__(self, state: ColumnarSimulationState):
+
+        self._state = state
+
+    def __getitem__(self, actor_name: ActorName) -> ActorState:
+
+        record = self._state.records[self._state.row(actor_name)]
+
+        return ActorState.from_wire_extras(
+            float(record['lat']),
+            float(record['lon']),
+            float(record['height']),
+            float(record['roll']),
+            float(record['pitch']),
+            float(record['yaw']),
+            self._state.additional_data.get(actor_name))
+
+    def __iter__(self) -> Iterator[ActorName]:
+        return iter(self._state.names[idx] for idx in self._state.records['name_idx'])
+
+    def __len__(self) -> int:
+        return len(self._state.records)
+
+
+class ColumnarSimulationState:
+
+    def __init__(self,
+        timestamp,
+        names: List[ActorName],
+        records: np.ndarray,
+        additional_data: Optional[Dict[ActorName, dict]] = None):
+
+        self.timestamp = timestamp
+        self.names = names
+        self.records = records
+        self.additional_data = additional_data if additional_data is not None else {}
+
+        self._rows: Optional[Dict[ActorName, int]] = None
+
+    def __repr__(self) -> str:
+        return "".join(["ColumnarSimulationState:", "\n", self.dumps()])
+
+    @staticmethod
+    def from_arrays(
+        timestamp,
+        names: List[ActorName],
+        lat: np.ndarray,
+        lon: np.ndarray,
+        height: np.ndarray,
+        roll: np.ndarray = 0,
+        pitch: np.ndarray = 0,
+        yaw: np.ndarray = 0,
+        additional_data: Optional[Dict[ActorName, dict]] = None) -> ColumnarSimulationState:
+
+        records = np.empty(len(names), dtype = ACTOR_RECORD)
+        records['name_idx'] = np.arange(len(names))
+        records['lat'] = lat
+        records['lon'] = lon
+        records['height'] = height
+        records['roll'] = roll
+        records['pitch'] = pitch
+        records['yaw'] = yaw
+
+        return ColumnarSimulationState(timestamp, list(names), records, additional_data)
+
+    @staticmethod
+    def from_simulation_state(state: SimulationState) -> ColumnarSimulationState:
+
+        names = list(state.actors.keys())
+        records = np.array(
+            [(idx, a.latitude, a.longitude, a.height_m, a.roll_rad, a.pitch_rad, a.yaw_rad)
+                for idx, a in enumerate(state.actors.values())],
+            dtype = ACTOR_RECORD)
+
+        additional_data = {}
+        for name, actor in state.actors.items():
+            actor_extras = actor.wire_extras()
+            if actor_extras is not None: additional_data[name] = actor_extras
+
+        return ColumnarSimulationState(state.timestamp, names, records, additional_data)
+
+    def to_simulation_state(self) -> SimulationState:
+        return SimulationState(self.timestamp, dict(self.actors.items()))
+
+    @property
+    def actors(self) -> ActorsView:
+        return ActorsView(self)
+
+    @property
+    def _row_index(self) -> Dict[ActorName, int]:
+
+        if self._rows is None:
+            self._rows = {self.names[idx]: row for row, idx in enumerate(self.records['name_idx'].tolist())}
+
+        return self._rows
+
+    def row(self, actor_name: ActorName) -> int:
+        return self._row_index[actor_name]
+
+    def has_actor(self, actor_name: ActorName) -> bool:
+        return actor_name in self._row_index
+
+    def get_actor(self, actor_name: ActorName) -> ActorState:
+        return self.actors[actor_name]
+
+    @staticmethod
+    def deserialize_bytes(sim_state_bytes: bytes) -> ColumnarSimulationState:
+
+        timestamp, names, offset, extras_len = read_header(sim_state_bytes)
+        view = memoryview(sim_state_bytes)
+
+        # Zero-copy: the records array is a view over the received message
+        records = np.frombuffer(sim_state_bytes, dtype = ACTOR_RECORD, count = len(names), offset = offset)
+        offset += records.nbytes
+
+        additional_data = orjson.loads(view[offset: offset + extras_len]) if extras_len else {}
+
+        return ColumnarSimulationState(timestamp, names, records, additional_data)
+
+    @staticmethod
+    def decode(msg: bytes, wire_format: str = WireFormat.AUTO) -> ColumnarSimulationState:
+
+        if wire_format == WireFormat.BINARY or (wire_format == WireFormat.AUTO and is_binary(msg)):
+            return ColumnarSimulationState.deserialize_bytes(msg)
+
+        return ColumnarSimulationState.from_simulation_state(SimulationState.deserialize(msg))
+
+    def dumps(self) -> str:
+        return self.to_simulation_state().dumps()
+
+    def dumpb(self) -> bytes:
+
+        names_bytes = NAME_SEPARATOR.join([name.encode() for name in self.names])
+        records = np.ascontiguousarray(self.records, dtype = ACTOR_RECORD)
+        extras_bytes = orjson.dumps(self.additional_data) if self.additional_data else b''
+
+        header = HEADER.pack(
+            BINARY_MAGIC, BINARY_VERSION, 0,
+            self.timestamp,
+            len(records),
+            len(names_bytes),
+            len(extras_bytes))
+
+        # The records buffer is written out as-is, without touching individual actors
+        return b''.join([header, names_bytes, records.data, extras_bytes])
+
+    def encode(self, wire_format: str = WireFormat.JSON) -> bytes:
+
+        if wire_format == WireFormat.BINARY:
+            return self.dumpb()
+
+        return self.dumps().encode()
@@ -0,0 +1,107 @@
+from __future__ import annotations
+from typing import AbstractSet, Dict, Optional, Tuple, Union, Any
+from flypywire.actor_state import ActorState
+from flypywire.simulation_state import SimulationState, ActorName
+from flypywire.columnar_state import ColumnarSimulationState
+from flypywire.wire_format import FLAG_KEYFRAME, FLAG_DELTA, read_flags
+
+
+def _pose(actor: ActorState) -> Tuple[float, ...]:
+    return (
+        actor.latitude,
+        actor.longitude,
+        actor.height_m,
+        actor.roll_rad,
+        actor.pitch_rad,
+        actor.yaw_rad)
+
+
+class DeltaEncoder:
+
+    def __init__(self, keyframe_interval: int = 60, tolerance: float = 1e-9):
+
+        self.keyframe_interval = keyframe_interval
+        self.tolerance = tolerance
+
+        self._sent: Dict[ActorName, Tuple[Tuple[float, ...], Any]] = {}
+        self._frames_since_keyframe = 0
+
+    def _changed(self, actor_name: ActorName, actor: ActorState) -> bool:
+
+        if actor_name not in self._sent:
+            return True
+
+        last_pose, last_extras = self._sent[actor_name]
+
+        if actor.wire_extras() != last_extras:
+            return True
+
+        return any(abs(value - last) > self.tolerance for value, last in zip(_pose(actor), last_pose))
+
+    def _needs_keyframe(self, state: SimulationState) -> bool:
+
+        # Deltas can add or update actors, but removals are only carried by keyframes
+        return (
+            not self._sent
+            or self._frames_since_keyframe >= self.keyframe_interval - 1
+            or any(actor_name not in state.actors for actor_name in self._sent))
+
+    def force_keyframe(self) -> None:
+        self._sent = {}
+
+    def encode(self, state: Union[SimulationState, ColumnarSimulationState]) -> bytes:
+
+        if isinstance(state, ColumnarSimulationState):
+            state = state.to_simulation_state()
+
+        if self._needs_keyframe(state):
+            self._sent = {}
+            self._frames_since_keyframe = 0
+            changed = state.actors
+            flags = FLAG_KEYFRAME
+
+        else:
+            self._frames_since_keyframe += 1
+            changed = {
+                actor_name: actor for actor_name, actor in state.actors.items()
+                if self._changed(actor_name, actor)}
+            flags = FLAG_DELTA
+
+        for actor_name, actor in changed.items():
+            extras = actor.wire_extras()
+            self._sent[actor_name] = (_pose(actor), dict(extras) if isinstance(extras, dict) else extras)
+
+        return SimulationState(state.timestamp, changed).dumpb(flags)
+
+
+class DeltaDecoder:
+
+    def __init__(self, actor_filter: Optional[AbstractSet[ActorName]] = None):
+
+        self.actor_filter = actor_filter
+        self._actors: Optional[Dict[ActorName, ActorState]] = None
+
+    @property
+    def synchronized(self) -> bool:
+        return self._actors is not None
+
+    @staticmethod
+    def is_delta_stream(msg: bytes) -> bool:
+        return bool(read_flags(msg) & (FLAG_KEYFRAME | FLAG_DELTA))
+
+    def apply(self, msg: bytes) -> Optional[SimulationState]:
+
+        flags = read_flags(msg)
+
+        # Late joiners drop deltas until the next keyframe arrives
+        if flags & FLAG_DELTA and not self.synchronized:
+            return None
+
+        state = SimulationState.deserialize_bytes(msg, self.actor_filter)
+
+        if flags & FLAG_DELTA:
+            self._actors.update(state.actors)
+            return SimulationState(state.timestamp, dict(self._actors))
+
+        self._actors = dict(state.actors)
+        return state
@@ -0,0 +1,95 @@
+from __future__ import annotations
+import orjson
+from typing import AbstractSet, Dict, Iterable, List, Optional
+from flypywire.actor_state import ActorState
+from flypywire.simulation_state import SimulationState, ActorName
+from flypywire.columnar_state import ColumnarSimulationState
+from flypywire.wire_format import WireFormat, is_binary
+
+
+class LazySimulationState:
+
+    def __init__(self,
+        msg: bytes,
+        wire_format: str = WireFormat.AUTO,
+        actor_filter: Optional[Iterable[ActorName]] = None):
+
+        self._msg = msg
+        self._binary = wire_format == WireFormat.BINARY or (wire_format == WireFormat.AUTO and is_binary(msg))
+        self.actor_filter: Optional[AbstractSet[ActorName]] = frozenset(actor_filter) if actor_filter is not None else None
+
+        # Binary messages are wrapped zero-copy; JSON messages are parsed on first access
+        self._columnar: Optional[ColumnarSimulationState] = None
+        self._sim_state_dict: Optional[dict] = None
+        self._actors: Dict[ActorName, ActorState] = {}
+
+    def __repr__(self) -> str:
+        return "".join(["LazySimulationState:", "\n", self.dumps()])
+
+    @property
+    def _parsed_binary(self) -> ColumnarSimulationState:
+
+        if self._columnar is None:
+            self._columnar = ColumnarSimulationState.deserialize_bytes(self._msg)
+
+        return self._columnar
+
+    @property
+    def _parsed_json(self) -> dict:
+
+        if self._sim_state_dict is None:
+            self._sim_state_dict = orjson.loads(self._msg)
+
+        return self._sim_state_dict
+
+    @property
+    def timestamp(self):
+        return self._parsed_binary.timestamp if self._binary else self._parsed_json["Timestamp"]
+
+    @property
+    def actor_names(self) -> List[ActorName]:
+
+        names = list(self._parsed_binary.actors) if self._binary else list(self._parsed_json["Actors"])
+
+        if self.actor_filter is not None:
+            return [name for name in names if name in self.actor_filter]
+
+        return names
+
+    def has_actor(self, actor_name: ActorName) -> bool:
+
+        if self.actor_filter is not None and actor_name not in self.actor_filter:
+            return False
+
+        if self._binary:
+            return self._parsed_binary.has_actor(actor_name)
+
+        return actor_name in self._parsed_json["Actors"]
+
+    def get_actor(self, actor_name: ActorName) -> ActorState:
+
+        if actor_name in self._actors:
+            return self._actors[actor_name]
+
+        if self.actor_filter is not None and actor_name not in self.actor_filter:
+            raise KeyError(f'{actor_name} is not in the actor filter of this state.')
+
+        if self._binary:
+            actor = self._parsed_binary.actors[actor_name]
+
+        else:
+            actor = ActorState.deserialize_dict(self._parsed_json["Actors"][actor_name])
+
+        self._actors[actor_name] = actor
+
+        return actor
+
+    @property
+    def actors(self) -> Dict[ActorName, ActorState]:
+        return {actor_name: self.get_actor(actor_name) for actor_name in self.actor_names}
+
+    def to_simulation_state(self) -> SimulationState:
+        return SimulationState(self.timestamp, self.actors)
+
+    def dumps(self) -> str:
+        return self.to_simulation_state().dumps()
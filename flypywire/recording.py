@@ -0,0 +1,268 @@
+from __future__ import annotations
+import mmap
+import struct
+import zlib
+from bisect import bisect_left, bisect_right
+from threading import Thread, Lock
+from typing import Iterator, List, Optional, Tuple, Union
+
+from flypywire.simulation_state import SimulationState
+from flypywire.columnar_state import ColumnarSimulationState
+from flypywire.lazy_state import LazySimulationState
+from flypywire.sim_state_pubsub import Publisher, Subscriber, DeliveryPolicy
+
+# State log layout (little-endian):
+#   file header | FILE_MAGIC
+#   chunks      | CHUNK_HEADER + zlib(entries), entries = ENTRY_HEADER + wire message
+#   index       | INDEX_MAGIC, n_chunks, then (first_ts, last_ts, offset) per chunk
+#   trailer     | index offset, TRAILER_MAGIC
+#
+# Chunks are appended as they fill up; the index and trailer are written on close.
+# A log without a trailer (e.g. the recorder crashed) is indexed by walking the chunk headers.
+
+FILE_MAGIC = b'FPWLOG01'
+CHUNK_MAGIC = b'FPWC'
+INDEX_MAGIC = b'FPWI'
+TRAILER_MAGIC = b'FPWE'
+
+CHUNK_HEADER = struct.Struct('<4sIddII')  # magic, n_msgs, first_ts, last_ts, compressed_len, raw_len
+ENTRY_HEADER = struct.Struct('<dI')  # timestamp, msg_len
+INDEX_HEADER = struct.Struct('<4sI')  # magic, n_chunks
+INDEX_ENTRY = struct.Struct('<ddQ')  # first_ts, last_ts, offset
+TRAILER = struct.Struct('<Q4s')  # index_offset, magic
+
+
+class StateRecorder:
+
+    def __init__(self,
+        path: str,
+        chunk_size: int = 256,
+        compression_level: int = 1):
+
+        self.path = path
+        self.chunk_size = chunk_size
+        self.compression_level = compression_level
+
+        self._file = open(path, 'wb')
+        self._file.write(FILE_MAGIC)
+
+        self._lock = Lock()
+        self._entries: List[bytes] = []
+        self._first_ts = 0.0
+        self._last_ts = 0.0
+        self._index: List[Tuple[float, float, int]] = []
+
+        self._subscriber: Optional[Subscriber] = None
+        self._thread: Optional[Thread] = None
+        self._publisher: Optional[Publisher] = None
+
+    def __str__(self) -> str:
+        return f'StateRecorder(path: {self.path})'
+
+    def __enter__(self) -> StateRecorder:
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        self.close()
+
+    def record_msg(self, timestamp: float, msg: bytes) -> None:
+
+        with self._lock:
+            if not self._entries: self._first_ts = timestamp
+            self._last_ts = timestamp
+
+            self._entries.append(ENTRY_HEADER.pack(timestamp, len(msg)))
+            self._entries.append(msg)
+
+            if len(self._entries) >= 2 * self.chunk_size: self._write_chunk()
+
+    def record(self, state: Union[SimulationState, ColumnarSimulationState]) -> None:
+        self.record_msg(state.timestamp, state.dumpb())
+
+    def attach(self, publisher: Publisher) -> None:
+
+        # Records every state right where it is published
+        self._publisher = publisher
+        publisher.add_hook(self.record)
+
+    def listen(self, host: str = 'tcp://127.0.0.1', port: int = 5555) -> None:
+
+        # Records the stream as a separate consumer; BLOCK keeps every frame in order
+        self._subscriber = Subscriber(host, port, delivery_policy = DeliveryPolicy.BLOCK, buffer_size = 2 * self.chunk_size)
+        self._thread = Thread(target = self._record_subscriber, daemon = True)
+
+        self._subscriber.start_listening()
+        self._thread.start()
+
+    def _record_subscriber(self) -> None:
+
+        while self._subscriber.wait_for_data():
+            msg = self._subscriber.pop_message()
+
+            if isinstance(msg, SimulationState):
+                self.record(msg)
+
+            else:
+                self.record_msg(LazySimulationState(msg).timestamp, msg)
+
+    def _write_chunk(self) -> None:
+
+        if not self._entries: return
+
+        raw = b''.join(self._entries)
+        compressed = zlib.compress(raw, self.compression_level)
+
+        offset = self._file.tell()
+        self._file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, len(self._entries) // 2, self._first_ts, self._last_ts, len(compressed), len(raw)))
+        self._file.write(compressed)
+
+        self._index.append((self._first_ts, self._last_ts, offset))
+        self._entries = []
+
+    def flush(self) -> None:
+
+        with self._lock:
+            self._write_chunk()
+            self._file.flush()
+
+    def close(self) -> None:
+
+        if self._publisher is not None: self._publisher.remove_hook(self.record)
+        if self._subscriber is not None: self._subscriber.close()
+        if self._thread is not None: self._thread.join()
+
+        with self._lock:
+            if self._file.closed: return
+
+            self._write_chunk()
+
+            index_offset = self._file.tell()
+            self._file.write(INDEX_HEADER.pack(INDEX_MAGIC, len(self._index)))
+            for entry in self._index: self._file.write(INDEX_ENTRY.pack(*entry))
+            self._file.write(TRAILER.pack(index_offset, TRAILER_MAGIC))
+
+            self._file.close()
+
+
+class StateLogReader:
+
+    def __init__(self, path: str):
+
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access = mmap.ACCESS_READ)
+
+        if self._mmap[:len(FILE_MAGIC)] != FILE_MAGIC:
+            raise ValueError(f'{path} is not a flypywire state log.')
+
+        self._index = self._read_index()
+        self._first_timestamps = [first_ts for first_ts, _, _ in self._index]
+        self._last_timestamps = [last_ts for _, last_ts, _ in self._index]
+
+        self._cached_chunk: Tuple[int, List[float], List[memoryview]] = (-1, [], [])
+
+    def __str__(self) -> str:
+        return f'StateLogReader(path: {self.path})'
+
+    def __enter__(self) -> StateLogReader:
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        self.close()
+
+    def _read_index(self) -> List[Tuple[float, float, int]]:
+
+        if len(self._mmap) >= len(FILE_MAGIC) + TRAILER.size:
+            index_offset, magic = TRAILER.unpack_from(self._mmap, len(self._mmap) - TRAILER.size)
+
+            if magic == TRAILER_MAGIC:
+                _, n_chunks = INDEX_HEADER.unpack_from(self._mmap, index_offset)
+                return list(INDEX_ENTRY.iter_unpack(
+                    self._mmap[index_offset + INDEX_HEADER.size: index_offset + INDEX_HEADER.size + n_chunks * INDEX_ENTRY.size]))
+
+        # Unterminated log: walk the chunk headers without decompressing anything
+        index = []
+        offset = len(FILE_MAGIC)
+
+        while offset + CHUNK_HEADER.size <= len(self._mmap):
+            magic, _, first_ts, last_ts, compressed_len, _ = CHUNK_HEADER.unpack_from(self._mmap, offset)
+            if magic != CHUNK_MAGIC or offset + CHUNK_HEADER.size + compressed_len > len(self._mmap): break
+
+            index.append((first_ts, last_ts, offset))
+            offset += CHUNK_HEADER.size + compressed_len
+
+        return index
+
+    def _chunk(self, chunk_idx: int) -> Tuple[List[float], List[memoryview]]:
+
+        if self._cached_chunk[0] == chunk_idx:
+            return self._cached_chunk[1], self._cached_chunk[2]
+
+        offset = self._index[chunk_idx][2]
+        _, n_msgs, _, _, compressed_len, _ = CHUNK_HEADER.unpack_from(self._mmap, offset)
+
+        start = offset + CHUNK_HEADER.size
+        raw = memoryview(zlib.decompress(self._mmap[start: start + compressed_len]))
+
+        timestamps, msgs = [], []
+        entry_offset = 0
+        for _ in range(n_msgs):
+            timestamp, msg_len = ENTRY_HEADER.unpack_from(raw, entry_offset)
+            entry_offset += ENTRY_HEADER.size
+
+            timestamps.append(timestamp)
+            msgs.append(raw[entry_offset: entry_offset + msg_len])
+            entry_offset += msg_len
+
+        self._cached_chunk = (chunk_idx, timestamps, msgs)
+
+        return timestamps, msgs
+
+    @property
+    def n_chunks(self) -> int:
+        return len(self._index)
+
+    @property
+    def start_time(self) -> Optional[float]:
+        return self._first_timestamps[0] if self._index else None
+
+    @property
+    def end_time(self) -> Optional[float]:
+        return self._last_timestamps[-1] if self._index else None
+
+    def read(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Tuple[float, memoryview]]:
+
+        # Binary search over the chunk index, then within the first chunk
+        chunk_idx = 0 if start is None else max(bisect_left(self._last_timestamps, start), 0)
+
+        for idx in range(chunk_idx, self.n_chunks):
+            if end is not None and self._first_timestamps[idx] > end: return
+
+            timestamps, msgs = self._chunk(idx)
+            msg_idx = 0 if start is None or idx != chunk_idx else bisect_left(timestamps, start)
+
+            for timestamp, msg in zip(timestamps[msg_idx:], msgs[msg_idx:]):
+                if end is not None and timestamp > end: return
+                yield timestamp, msg
+
+    def states(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[SimulationState]:
+
+        for _, msg in self.read(start, end):
+            yield SimulationState.decode(msg)
+
+    def state_at(self, timestamp: float) -> Optional[SimulationState]:
+
+        # Latest state recorded at or before timestamp
+        chunk_idx = bisect_right(self._first_timestamps, timestamp) - 1
+        if chunk_idx < 0: return None
+
+        timestamps, msgs = self._chunk(chunk_idx)
+        msg_idx = bisect_right(timestamps, timestamp) - 1
+
+        return SimulationState.decode(msgs[msg_idx])
+
+    def close(self) -> None:
+
+        self._cached_chunk = (-1, [], [])
+        self._mmap.close()
+        self._file.close()
@@ -0,0 +1,203 @@
+from __future__ import annotations
+import time
+import logging
+from threading import Thread, Condition
+from typing import Optional, Union
+
+from flypywire.simulation_state import SimulationState
+from flypywire.recording import StateLogReader
+
+# Republishes a recorded state log to anything with a publish_simulation_state(state)
+# method: a Publisher, an AsyncPublisher driven from a thread, or a unityapi RenderContext.
+#
+# The log is streamed one chunk at a time, so memory stays bounded by the chunk size
+# whatever the length of the recording.
+
+
+class Replayer:
+
+    def __init__(self,
+        log: Union[str, StateLogReader],
+        target,
+        speed: Optional[float] = 1.0,
+        loop: bool = False,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        debug: bool = False):
+
+        self.reader = log if isinstance(log, StateLogReader) else StateLogReader(log)
+        self._owns_reader = not isinstance(log, StateLogReader)
+
+        self.target = target
+        self.loop = loop
+        self.start_time = start if start is not None else self.reader.start_time
+        self.end_time = end if end is not None else self.reader.end_time
+        self.debug = debug
+
+        # speed = None (or 0) replays as fast as the target accepts states
+        self._speed = speed
+        self._position = self.start_time
+        self._seek_to: Optional[float] = None
+        self._paused = False
+        self._stopped = False
+        self._condition = Condition()
+
+        self._anchor_wall = 0.0
+        self._anchor_ts = 0.0
+
+        self.published = 0
+        self._thread: Optional[Thread] = None
+
+    def __str__(self) -> str:
+        return f'Replayer(log: {self.reader.path}, speed: {self._speed})'
+
+    def __enter__(self) -> Replayer:
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        self.close()
+
+    @property
+    def speed(self) -> Optional[float]:
+        return self._speed
+
+    @speed.setter
+    def speed(self, speed: Optional[float]) -> None:
+
+        with self._condition:
+            self._speed = speed
+            self._reanchor(self._position)
+            self._condition.notify_all()
+
+    @property
+    def position(self) -> Optional[float]:
+        return self._position
+
+    @property
+    def is_paused(self) -> bool:
+        return self._paused
+
+    @property
+    def is_playing(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _reanchor(self, timestamp: float) -> None:
+
+        self._anchor_wall = time.monotonic()
+        self._anchor_ts = timestamp
+
+    def _publish(self, state: SimulationState) -> None:
+
+        # RenderContext sleeps after every publish by default; the replay clock paces instead
+        if hasattr(self.target, 'client'): self.target.publish_simulation_state(state, time_sleep_s = 0)
+        else: self.target.publish_simulation_state(state)
+
+        self.published += 1
+
+    def _wait_until(self, timestamp: float) -> bool:
+
+        # Returns False when the wait was interrupted by a seek or stop
+        with self._condition:
+            while True:
+                if self._stopped or self._seek_to is not None: return False
+
+                if self._paused:
+                    self._condition.wait()
+                    continue
+
+                if not self._speed: return True
+
+                delay = self._anchor_wall + (timestamp - self._anchor_ts) / self._speed - time.monotonic()
+                if delay <= 0: return True
+
+                self._condition.wait(delay)
+
+    def _play_from(self, start: float) -> bool:
+
+        # Returns True when the end of the range was reached
+        with self._condition: self._reanchor(start)
+
+        for timestamp, msg in self.reader.read(start, self.end_time):
+            if not self._wait_until(timestamp): return False
+
+            self._position = timestamp
+            self._publish(SimulationState.decode(msg))
+
+        return True
+
+    @property
+    def is_empty(self) -> bool:
+        return self.start_time is None or self.end_time is None
+
+    def play(self) -> None:
+
+        if self.is_empty:
+            if self.debug: logging.info(msg = f'{self} has no states to replay')
+            return
+
+        position = self._position
+
+        while True:
+            published = self.published
+            finished = self._play_from(position)
+
+            with self._condition:
+                if self._stopped: break
+
+                if self._seek_to is not None:
+                    position, self._seek_to = self._seek_to, None
+                    continue
+
+            # A pass over the whole range that published nothing would loop forever
+            if finished and self.loop and not (position == self.start_time and self.published == published):
+                position = self.start_time
+                continue
+
+            break
+
+        if self.debug: logging.info(msg = f'{self} finished after {self.published} states')
+
+    def start(self) -> None:
+
+        self._stopped = False
+        self._thread = Thread(target = self.play, daemon = True)
+        self._thread.start()
+
+    def pause(self) -> None:
+
+        with self._condition:
+            self._paused = True
+            self._condition.notify_all()
+
+    def resume(self) -> None:
+
+        with self._condition:
+            self._paused = False
+            self._reanchor(self._position)
+            self._condition.notify_all()
+
+    def seek(self, timestamp: float) -> None:
+
+        if self.is_empty:
+            raise ValueError(f'{self} has no states to seek to.')
+
+        with self._condition:
+            self._seek_to = min(max(timestamp, self.start_time), self.end_time)
+            self._position = self._seek_to
+            self._condition.notify_all()
+
+    def wait(self, timeout_secs: Optional[float] = None) -> None:
+        if self._thread is not None: self._thread.join(timeout_secs)
+
+    def stop(self) -> None:
+
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+        self.wait()
+
+    def close(self) -> None:
+
+        self.stop()
+        if self._owns_reader: self.reader.close()
@@ -0,0 +1,253 @@
+from __future__ import annotations
+import struct
+import time
+import zmq
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, List, Optional
+
+# Same-host transport for Publisher/Subscriber, selected with host = 'shm://<name>'.
+#
+# The publisher owns a ring of fixed-size slots in shared memory. Each slot is
+# guarded by a sequence stamp (odd while being written, 2 * seq once committed),
+# so any number of readers can copy messages out without locks and detect slots
+# that were overwritten while they were reading.
+
+SHM_SCHEME = 'shm://'
+
+RING_MAGIC = b'FPWR'
+RING_HEADER = struct.Struct('<4sII4xQ')  # magic, slot_count, slot_size, write_seq
+WRITE_SEQ = struct.Struct('<Q')
+WRITE_SEQ_OFFSET = RING_HEADER.size - WRITE_SEQ.size
+SLOT_HEADER = struct.Struct('<QI')  # stamp, length
+
+_owned_segments = set()
+
+
+def is_shm_address(host: str) -> bool:
+    return host.startswith(SHM_SCHEME)
+
+
+def shm_name(address: str) -> str:
+    # 'shm://flypywire:5555' -> 'flypywire-5555'
+    return address[len(SHM_SCHEME):].replace(':', '-').replace('/', '-')
+
+
+class SharedMemoryRing:
+
+    def __init__(self, shm: SharedMemory, slot_count: int, slot_size: int, owner: bool):
+
+        self.shm = shm
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.owner = owner
+        self.buf = shm.buf
+
+    @staticmethod
+    def create(name: str, slot_count: int = 64, slot_size: int = 1 << 16) -> SharedMemoryRing:
+
+        shm = SharedMemory(name, create = True, size = RING_HEADER.size + slot_count * slot_size)
+        RING_HEADER.pack_into(shm.buf, 0, RING_MAGIC, slot_count, slot_size, 0)
+        _owned_segments.add(name)
+
+        return SharedMemoryRing(shm, slot_count, slot_size, owner = True)
+
+    @staticmethod
+    def attach(name: str) -> SharedMemoryRing:
+
+        shm = SharedMemory(name)
+
+        # Readers in other processes must not unlink the segment when they exit; only the publisher owns it
+        if name not in _owned_segments: resource_tracker.unregister(shm._name, 'shared_memory')
+
+        magic, slot_count, slot_size, _ = RING_HEADER.unpack_from(shm.buf)
+        if magic != RING_MAGIC:
+            shm.close()
+            raise ValueError(f'Shared memory segment {name} is not a flypywire ring.')
+
+        return SharedMemoryRing(shm, slot_count, slot_size, owner = False)
+
+    @property
+    def write_seq(self) -> int:
+        return WRITE_SEQ.unpack_from(self.buf, WRITE_SEQ_OFFSET)[0]
+
+    @property
+    def max_msg_size(self) -> int:
+        return self.slot_size - SLOT_HEADER.size
+
+    def _slot_offset(self, seq: int) -> int:
+        return RING_HEADER.size + (seq % self.slot_count) * self.slot_size
+
+    def write(self, *parts: bytes) -> int:
+
+        length = sum(len(memoryview(part).cast('B')) for part in parts)
+        if length > self.max_msg_size:
+            raise ValueError(f'Message of {length} bytes does not fit in a {self.slot_size} bytes ring slot.')
+
+        seq = self.write_seq + 1
+        offset = self._slot_offset(seq)
+        payload_offset = offset + SLOT_HEADER.size
+
+        SLOT_HEADER.pack_into(self.buf, offset, 2 * seq - 1, length)
+        for part in parts:
+            part = memoryview(part).cast('B')
+            self.buf[payload_offset: payload_offset + len(part)] = part
+            payload_offset += len(part)
+        SLOT_HEADER.pack_into(self.buf, offset, 2 * seq, length)
+        WRITE_SEQ.pack_into(self.buf, WRITE_SEQ_OFFSET, seq)
+
+        return seq
+
+    def view(self, seq: int) -> Optional[memoryview]:
+
+        # Zero-copy access to a committed slot; it stays valid until slot_count newer messages are written
+        offset = self._slot_offset(seq)
+        stamp, length = SLOT_HEADER.unpack_from(self.buf, offset)
+        if stamp != 2 * seq: return None
+
+        return self.buf[offset + SLOT_HEADER.size: offset + SLOT_HEADER.size + length]
+
+    def is_valid(self, seq: int) -> bool:
+        return SLOT_HEADER.unpack_from(self.buf, self._slot_offset(seq))[0] == 2 * seq
+
+    def read(self, seq: int) -> Optional[bytes]:
+
+        offset = self._slot_offset(seq)
+        payload_offset = offset + SLOT_HEADER.size
+
+        stamp, length = SLOT_HEADER.unpack_from(self.buf, offset)
+        if stamp != 2 * seq: return None
+
+        msg = bytes(self.buf[payload_offset: payload_offset + length])
+
+        # The slot may have been rewritten while copying
+        if SLOT_HEADER.unpack_from(self.buf, offset)[0] != 2 * seq: return None
+
+        return msg
+
+    def close(self) -> None:
+
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+            _owned_segments.discard(self.shm.name)
+
+
+class ShmPublisherSocket:
+
+    # Quacks like the zmq.PUB socket used by Publisher
+
+    def __init__(self, slot_count: int = 64, slot_size: int = 1 << 16):
+
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.ring: Optional[SharedMemoryRing] = None
+        self.closed = False
+
+    def bind(self, address: str) -> None:
+        self.ring = SharedMemoryRing.create(shm_name(address), self.slot_count, self.slot_size)
+
+    def send_multipart(self, frames: List[bytes]) -> None:
+
+        if len(frames) != 1:
+            raise ValueError('The shared-memory transport only carries single-frame messages.')
+
+        self.ring.write(frames[0])
+
+    def close(self, linger: Optional[int] = None) -> None:
+
+        if self.ring is not None: self.ring.close()
+        self.ring = None
+        self.closed = True
+
+
+class ShmSubscriberSocket:
+
+    # Quacks like the zmq.SUB socket used by Subscriber
+
+    def __init__(self, poll_interval_secs: float = 0.0005):
+
+        self.poll_interval_secs = poll_interval_secs
+        self.name: Optional[str] = None
+        self.ring: Optional[SharedMemoryRing] = None
+        self.next_seq = 0
+        self.closed = False
+
+        # Called with the number of messages that were overwritten before this reader got to them
+        self.on_overrun: Optional[Callable[[int], None]] = None
+
+    def connect(self, address: str) -> None:
+        self.name = shm_name(address)
+
+    def disconnect(self, address: str) -> None:
+
+        if self.ring is not None: self.ring.close()
+        self.ring = None
+
+    def subscribe(self, topic) -> None: ...
+
+    def _attached(self) -> bool:
+
+        if self.ring is None:
+            try:
+                self.ring = SharedMemoryRing.attach(self.name)
+
+            except FileNotFoundError:
+                return False
+
+            self.next_seq = self.ring.write_seq + 1
+
+        return True
+
+    def poll(self, timeout: Optional[float] = None, flags: int = zmq.POLLIN) -> int:
+
+        deadline = time.monotonic() + (timeout / 1000 if timeout is not None else float('inf'))
+
+        while not self.closed:
+            if self._attached() and self.ring.write_seq >= self.next_seq:
+                return zmq.POLLIN
+
+            if time.monotonic() >= deadline: return 0
+            time.sleep(self.poll_interval_secs)
+
+        return 0
+
+    def _skip_overrun(self, write_seq: int) -> None:
+
+        oldest = max(write_seq - self.ring.slot_count + 2, self.next_seq + 1)
+        if self.on_overrun: self.on_overrun(oldest - self.next_seq)
+        self.next_seq = oldest
+
+    def recv_multipart(self, flags: int = 0) -> List[bytes]:
+
+        while True:
+            if not (flags & zmq.NOBLOCK):
+                self.poll()
+
+            if self.closed or not self._attached():
+                raise zmq.error.Again()
+
+            write_seq = self.ring.write_seq
+            if self.next_seq > write_seq:
+                raise zmq.error.Again()
+
+            if write_seq - self.next_seq >= self.ring.slot_count - 1:
+                self._skip_overrun(write_seq)
+
+            msg = self.ring.read(self.next_seq)
+            if msg is None:
+                self._skip_overrun(self.ring.write_seq)
+                continue
+
+            self.next_seq += 1
+            return [msg]
+
+    def setsockopt(self, option: int, value) -> None:
+        raise ValueError('Socket options are not supported by the shared-memory transport.')
+
+    def close(self, linger: Optional[int] = None) -> None:
+
+        if self.ring is not None: self.ring.close()
+        self.ring = None
+        self.closed = True
@@ -2,41 +2,156 @@ from __future__ import annotations
 import zmq
 import json
 from collections import deque
-from threading import Thread
+from threading import Thread, Event, Condition, Lock, current_thread
 import logging
 import time
-from typing import List, Union, Dict, NewType
+import random
+from typing import Callable, List, Optional, Union, Dict, NewType
 
-from flypywire import SimulationState, ActorState
+from flypywire import SimulationState, ActorState, ColumnarSimulationState
+from flypywire.wire_format import WireFormat, FRAME_TOPIC, actor_topic, is_replay, is_stamp, stamp_frame, split_replay, split_stamp
+from flypywire.delta import DeltaEncoder, DeltaDecoder
+from flypywire.lazy_state import LazySimulationState
+from flypywire.stream_metrics import StreamMetrics
+from flypywire.zmq_context import create_socket
+from flypywire.shm_transport import ShmPublisherSocket, ShmSubscriberSocket, is_shm_address
 
 
 LOGGING_FORMAT = '[%(asctime)s] %(message)s'
 logging.basicConfig(format = LOGGING_FORMAT, level=logging.INFO)
 
 
+class DeliveryPolicy:
+
+    LATEST_ONLY = 'latest_only'
+    DROP_OLDEST = 'drop_oldest'
+    BLOCK = 'block'
+
+
+class DeliveryStats:
+
+    def __init__(self):
+
+        self.received = 0
+        self.dropped = 0
+        self.consumed = 0
+
+    def __repr__(self) -> str:
+        return f'DeliveryStats(received: {self.received}, dropped: {self.dropped}, consumed: {self.consumed})'
+
+    @property
+    def pending(self) -> int:
+        return self.received - self.dropped - self.consumed
+
+
 class Publisher:
 
     def __init__(self,
         host: str = "tcp://127.0.0.1",
         port: int = 5555,
-        debug: bool = False):
+        debug: bool = False,
+        wire_format: str = WireFormat.JSON,
+        keyframe_interval: int = 60,
+        delta_tolerance: float = 1e-9,
+        per_actor_topics: bool = False,
+        actor_groups: Optional[Dict[str, str]] = None,
+        shm_slot_count: int = 64,
+        shm_slot_size: int = 1 << 16,
+        connect: bool = False,
+        stamp_messages: bool = False):
+        
+        if per_actor_topics and wire_format == WireFormat.DELTA:
+            raise ValueError('Delta encoding cannot be combined with per-actor topics.')
+        
+        if per_actor_topics and is_shm_address(host):
+            raise ValueError('Per-actor topics are not supported by the shared-memory transport.')
+        
+        if stamp_messages and is_shm_address(host):
+            raise ValueError('Message stamps are not supported by the shared-memory transport.')
         
         self.host = host
         self.port = port
         self.address = f"{self.host}:{self.port}"
-        self.socket = zmq.Context().socket(zmq.PUB)
-        self.socket.bind(self.address)
+        self.shm_slot_count = shm_slot_count
+        self.shm_slot_size = shm_slot_size
+        self.socket = self._create_socket(zmq.PUB)
+        
+        # connect = True publishes into a Broker frontend instead of binding the port
+        if connect: self.socket.connect(self.address)
+        else: self.socket.bind(self.address)
 
         self.debug = debug
+        self.wire_format = wire_format
+        self.delta_encoder = DeltaEncoder(keyframe_interval, delta_tolerance)
+        self.per_actor_topics = per_actor_topics
+        self.actor_groups = actor_groups if actor_groups is not None else {}
+        self.hooks: List[Callable[[Union[SimulationState, ColumnarSimulationState]], None]] = []
+        
+        # Stamps add a trailing frame, which the Unity server does not expect; keep them for Python consumers
+        self.stamp_messages = stamp_messages
+        self.sequence = 0
+        self.publisher_id = random.getrandbits(32)
         
     
     def __str__(self) -> str:
 
         return f'Publisher(address: {self.address})'
     
-    def publish_simulation_state(self, state: SimulationState) -> None:
+    def _create_socket(self, socket_type: int) -> zmq.Socket:
+        
+        # host = 'shm://<name>' publishes through a shared-memory ring; 'inproc://<name>' works
+        # between threads because every socket lives on the shared context
+        if is_shm_address(self.host): return ShmPublisherSocket(self.shm_slot_count, self.shm_slot_size)
+        
+        return create_socket(socket_type, owner = self)
+
+    def _topic_messages(self, state: Union[SimulationState, ColumnarSimulationState]) -> List[List[bytes]]:
+
+        topics: Dict[str, Dict[str, ActorState]] = {}
+        for actor_name, actor in state.actors.items():
+            topics.setdefault(self.actor_groups.get(actor_name, actor_name), {})[actor_name] = actor
+        
+        messages = [
+            [actor_topic(topic), SimulationState(state.timestamp, actors).encode(self.wire_format)]
+            for topic, actors in topics.items()]
+        
+        messages.append([FRAME_TOPIC, SimulationState(state.timestamp, {}).encode(self.wire_format)])
+        
+        return messages
+
+    def _encode_messages(self, state: Union[SimulationState, ColumnarSimulationState]) -> List[List[bytes]]:
 
-        self.socket.send_string(state.dumps())
+        if self.per_actor_topics:
+            return self._topic_messages(state)
+        
+        if self.wire_format == WireFormat.DELTA:
+            return [[self.delta_encoder.encode(state)]]
+        
+        return [[state.encode(self.wire_format)]]
+
+    def _messages(self, state: Union[SimulationState, ColumnarSimulationState]) -> List[List[bytes]]:
+
+        messages = self._encode_messages(state)
+        
+        if self.stamp_messages:
+            self.sequence += 1
+            stamp = stamp_frame(self.publisher_id, self.sequence, time.monotonic())
+            for msg in messages: msg.append(stamp)
+        
+        return messages
+
+    def add_hook(self, hook: Callable[[Union[SimulationState, ColumnarSimulationState]], None]) -> None:
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook: Callable[[Union[SimulationState, ColumnarSimulationState]], None]) -> None:
+        self.hooks.remove(hook)
+
+    def publish_simulation_state(self, state: Union[SimulationState, ColumnarSimulationState]) -> None:
+
+        for msg in self._messages(state):
+            self.socket.send_multipart(msg)
+        
+        for hook in self.hooks: hook(state)
         
         if self.debug: logging.info(msg = f'Publishing SimulationState:\n{state.dumps()}')
 
@@ -52,29 +167,99 @@ class Subscriber:
         host: str = 'tcp://127.0.0.1',
         port: int = 5555,
         debug: bool = False,
-        timeout_secs: float = 1):
+        timeout_secs: float = 1,
+        wire_format: str = WireFormat.AUTO,
+        lazy: bool = False,
+        actor_filter: Optional[List[str]] = None,
+        topics: Optional[List[str]] = None,
+        on_timeout: Optional[Callable[[Subscriber], None]] = None,
+        on_reconnect: Optional[Callable[[Subscriber], None]] = None,
+        delivery_policy: str = DeliveryPolicy.LATEST_ONLY,
+        buffer_size: int = 10,
+        conflate: bool = False):
+
+        # ZMQ_CONFLATE keeps a single frame per socket: it cannot carry multipart topic frames,
+        # would silently drop the deltas of a delta stream, and needs publishers without
+        # stamp_messages, since only the trailing stamp of a stamped message would arrive.
+        if conflate and (topics is not None or delivery_policy != DeliveryPolicy.LATEST_ONLY or is_shm_address(host)):
+            raise ValueError('conflate is only supported for single-frame ZMQ streams with DeliveryPolicy.LATEST_ONLY.')
+
+        if topics is not None and is_shm_address(host):
+            raise ValueError('Per-actor topics are not supported by the shared-memory transport.')
 
         self.host = host
         self.port = port
         self.address = f'{self.host}:{self.port}'
-
-        self.socket = zmq.Context().socket(zmq.SUB)
-        self.socket.connect(self.address)
-        self.socket.subscribe("") #Subscribing to all topics in this address
+        self.conflate = conflate
+        
+        # Topics are actor (or actor group) names of a publisher running with per_actor_topics
+        self.topics = topics
+        self.socket = self._open_socket()
         
         self.debug = debug
         self.timeout_secs = timeout_secs
+        self.wire_format = wire_format
+        self.lazy = lazy
+        self.actor_filter = frozenset(actor_filter) if actor_filter is not None else None
+        
+        self.on_timeout = on_timeout
+        self.on_reconnect = on_reconnect
         
         self.__last_msg_time = -10
         
+        self._stop_event = Event()
         self._listener_thread = Thread(target = self._rcv_sim_state_str, daemon=True)
+        self._restart_event = Event()
+        self._reconnect_event = Event()
+        self._reconnect_lock = Lock()
 
-        self.buffer: deque[str] = deque(maxlen=10) #type: ignore
+        self.delivery_policy = delivery_policy
+        self.stats = DeliveryStats()
+        self.buffer: deque[Union[bytes, SimulationState]] = deque( #type: ignore
+            maxlen = 1 if delivery_policy == DeliveryPolicy.LATEST_ONLY else buffer_size)
+        self._buffer_condition = Condition()
+        self.delta_decoder = DeltaDecoder(self.actor_filter)
+        self._topic_actors: Dict[str, ActorState] = {}
+        
+        # Filled in when the publisher stamps its messages
+        self.metrics = StreamMetrics()
+        self._warned_lone_trailer = False
+        self._live = False
+        self._replay_id: Optional[int] = None
 
     def __str__(self) -> str:
 
         return f'Subscriber(address: {self.address})'
     
+    def _create_socket(self, socket_type: int) -> zmq.Socket:
+        
+        if is_shm_address(self.host): return ShmSubscriberSocket()
+        
+        return create_socket(socket_type, owner = self)
+    
+    def _open_socket(self) -> zmq.Socket:
+        
+        socket = self._create_socket(zmq.SUB)
+        if is_shm_address(self.host): socket.on_overrun = self._on_overrun
+        if self.conflate: socket.setsockopt(zmq.CONFLATE, 1)
+        socket.connect(self.address)
+        
+        if self.topics is None:
+            socket.subscribe("") #Subscribing to all topics in this address
+        
+        else:
+            for topic in self.topics: socket.subscribe(actor_topic(topic))
+            socket.subscribe(FRAME_TOPIC)
+        
+        return socket
+    
+    def _on_overrun(self, n_msgs: int) -> None:
+        
+        # Messages overwritten in the shared-memory ring before we read them
+        self.stats.received += n_msgs
+        self.stats.dropped += n_msgs
+        self.delta_decoder = DeltaDecoder(self.actor_filter)
+    
     @property
     def _timeout(self) -> bool:
         return time.time() - self.__last_msg_time > self.timeout_secs
@@ -84,35 +269,244 @@ class Subscriber:
         self.__last_msg_time = time.time()
     
 
-    def _rcv_sim_state_str(self) -> None:
+    @property
+    def _buffer_full(self) -> bool:
+        return len(self.buffer) >= self.buffer.maxlen
+
+    def _push(self, msg: Union[bytes, SimulationState]) -> None:
+
+        with self._buffer_condition:
+            self.stats.received += 1
+            if self._buffer_full: self.stats.dropped += 1
+            self.buffer.append(msg)
+            self._buffer_condition.notify_all()
+
+    def _pop(self) -> Union[bytes, SimulationState]:
+
+        with self._buffer_condition:
+            if self.delivery_policy == DeliveryPolicy.LATEST_ONLY:
+                msg = self.buffer.pop()
+            
+            else:
+                msg = self.buffer.popleft()
+            
+            self.stats.consumed += 1
+            self._buffer_condition.notify_all()
+
+        return msg
 
-        while True:
+    @property
+    def _listener_stopping(self) -> bool:
+        return self._stop_event.is_set() or self._restart_event.is_set()
+
+    def _wait_for_space(self) -> None:
+
+        with self._buffer_condition:
+            while self._buffer_full and not self._listener_stopping:
+                self._buffer_condition.wait(self.timeout_secs)
+
+    def _handle_topic_msg(self, topic: bytes, msg: bytes) -> None:
+
+        if topic == FRAME_TOPIC:
+            frame = SimulationState.decode(msg, self.wire_format)
+            self._push(SimulationState(frame.timestamp, self._topic_actors))
+            self._topic_actors = {}
+        
+        else:
+            self._topic_actors.update(SimulationState.decode(msg, self.wire_format, self.actor_filter).actors)
+
+    def _handle_msg(self, msg: bytes) -> None:
+
+        # Deltas must be applied in order, so delta streams are reconstructed as they arrive
+        if DeltaDecoder.is_delta_stream(msg):
+            if self.conflate and self.stats.received == 0:
+                logging.warning(msg = f'{self} conflates a delta stream; states between keyframes will be inconsistent.')
+            
+            state = self.delta_decoder.apply(msg)
+            if state is not None: self._push(state)
+        
+        else:
+            self._push(msg)
+
+    def _handle_frames(self, frames: List[bytes]) -> None:
+
+        self._update_last_msg_time()
+
+        # A conflated socket keeps only the last frame of a stamped (or broker replayed) message
+        if len(frames) == 1 and (is_stamp(frames[0]) or is_replay(frames[0])):
+            if not self._warned_lone_trailer:
+                logging.warning(msg = f'{self} received a stamp or replay frame without its message; conflate needs a publisher without stamp_messages.')
+                self._warned_lone_trailer = True
+            
+            self.stats.received += 1
+            self.stats.dropped += 1
+            return
+
+        # Broker cache replays are for subscribers that have not seen a live message yet
+        frames, replay_id = split_replay(frames)
+        if replay_id is None:
+            self._live = True
+        
+        elif self._live or self._replay_id not in (None, replay_id):
+            return
+        
+        else:
+            self._replay_id = replay_id
+
+        frames, stamp = split_stamp(frames)
+        if stamp is not None:
+            publisher_id, seq, send_time = stamp
+            self.metrics.record(seq, send_time, source = publisher_id)
+
+        # Delta and topic streams are decoded here, on the listener thread: a message that cannot be
+        # decoded (e.g. an unregistered telemetry schema) is logged and dropped instead of killing it
+        try:
+            if len(frames) == 2:
+                self._handle_topic_msg(*frames)
+            
+            else:
+                self._handle_msg(frames[-1])
+        
+        except Exception as exc:
+            self.stats.received += 1
+            self.stats.dropped += 1
+            logging.warning(msg = f'{self}: dropping a message that could not be decoded: {exc!r}')
+            return
+        
+        if self.debug: logging.info(msg = f'Receiving:\n{frames[-1]}')
+
+    def _rcv_available_msgs(self) -> None:
+
+        # With DeliveryPolicy.BLOCK, unread messages stay in the socket queue until the buffer has room
+        while not (self.delivery_policy == DeliveryPolicy.BLOCK and self._buffer_full):
             try:
-                msg = self.socket.recv_string(zmq.NOBLOCK)
-                self.buffer.append(msg)
-                self._update_last_msg_time()
-                
-                if self.debug: logging.info(msg = f'Receiving:\n{msg}')
+                frames = self.socket.recv_multipart(zmq.NOBLOCK)
             
             except zmq.error.Again:
-                if self._timeout:
-                    logging.info(msg = f'Waiting for connection...')
-                    time.sleep(0.5)
+                return
+            
+            self._handle_frames(frames)
 
-        self.close()
+    def _rcv_sim_state_str(self) -> None:
+
+        waiting = False
+        
+        # Blocks in poll() until data arrives or timeout_secs elapses, so close() is honoured within one timeout
+        while not self._listener_stopping:
+            
+            # Requested by reconnect() from a callback on this thread
+            if self._reconnect_event.is_set():
+                self._reconnect_event.clear()
+                self._reconnect_in_place()
+            
+            if self.delivery_policy == DeliveryPolicy.BLOCK:
+                self._wait_for_space()
+            
+            try:
+                if not self.socket.poll(self.timeout_secs * 1000):
+                    if self._timeout:
+                        if not waiting: logging.info(msg = f'Waiting for connection...')
+                        waiting = True
+                        if self.on_timeout: self.on_timeout(self)
+                    continue
+                
+                if waiting and self.on_reconnect: self.on_reconnect(self)
+                waiting = False
+                
+                self._rcv_available_msgs()
+            
+            except zmq.error.ZMQError:
+                # The shared context was terminated underneath us
+                if self.socket.closed: return
+                raise
 
 
     @property
     def is_data_available(self) -> bool:
         return len(self.buffer) > 0
 
+    def wait_for_data(self, timeout_secs: Optional[float] = None) -> bool:
+        
+        with self._buffer_condition:
+            return self._buffer_condition.wait_for(
+                lambda: self.is_data_available or self._stop_event.is_set(), timeout_secs) and self.is_data_available
+
+    @property
+    def is_listening(self) -> bool:
+        return self._listener_thread.is_alive()
+
     def start_listening(self) -> None:
         self._listener_thread.start()
 
-    def get_simulation_state(self) -> SimulationState: # type: ignore
-        return SimulationState.deserialize(self.buffer.pop())
+    def _reset_stream(self) -> None:
+
+        # Drop any half-received topic frame and wait for the next keyframe instead of applying
+        # deltas across the gap. Resubscribing makes a broker replay its cache, which this subscriber now needs again
+        self._topic_actors = {}
+        self.delta_decoder = DeltaDecoder(self.actor_filter)
+        self._live = False
+        self._replay_id = None
+
+    def _reconnect_in_place(self) -> None:
+
+        self.socket.disconnect(self.address)
+        self.socket.connect(self.address)
+        self._reset_stream()
+
+    def reconnect(self) -> None:
+
+        # The listener thread owns the socket while it runs. Called from it (e.g. from on_timeout),
+        # only ask it to reconnect once the callback returns: taking the lock here could deadlock
+        # with another thread that holds it while joining the listener
+        if current_thread() is self._listener_thread:
+            self._reconnect_event.set()
+            return
+
+        with self._reconnect_lock:
+            # From any other thread, stop the listener, rebuild the socket and restart the listener
+            if self.is_listening:
+                self._restart_event.set()
+                with self._buffer_condition: self._buffer_condition.notify_all()
+                self._listener_thread.join()
+                
+                self.socket.close(linger = 0)
+                self.socket = self._open_socket()
+                self._reset_stream()
+                
+                self._restart_event.clear()
+                self._reconnect_event.clear()
+                self._listener_thread = Thread(target = self._rcv_sim_state_str, daemon=True)
+                if not self._stop_event.is_set(): self._listener_thread.start()
+            
+            else:
+                self._reconnect_in_place()
+
+    def pop_message(self) -> Union[bytes, SimulationState]:
+        
+        # Raw wire message, or an already reconstructed state for delta and topic streams
+        return self._pop()
+
+    def get_simulation_state(self) -> Union[SimulationState, LazySimulationState]: # type: ignore
+        
+        msg = self._pop()
+        if isinstance(msg, SimulationState): return msg
+        
+        if self.lazy: return LazySimulationState(msg, self.wire_format, self.actor_filter)
+        
+        return SimulationState.decode(msg, self.wire_format, self.actor_filter)
+    
+    def get_columnar_state(self) -> ColumnarSimulationState:
+        
+        msg = self._pop()
+        if isinstance(msg, SimulationState): return ColumnarSimulationState.from_simulation_state(msg)
+        
+        return ColumnarSimulationState.decode(msg, self.wire_format)
         
     def close(self) -> None:
+        
+        self._stop_event.set()
+        with self._buffer_condition: self._buffer_condition.notify_all()
+        if self._listener_thread.is_alive(): self._listener_thread.join()
+        
         self.socket.close()
-        self._listener_thread.join()
         logging.info(msg = f'Closing {self}')
\ No newline at end of file
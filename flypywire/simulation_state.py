@@ -1,7 +1,16 @@
 from __future__ import annotations
 import orjson
-from typing import Dict, NewType
+from typing import AbstractSet, Dict, NewType, Optional
 from flypywire.actor_state import ActorState
+from flypywire.wire_format import (
+    WireFormat,
+    BINARY_MAGIC,
+    BINARY_VERSION,
+    NAME_SEPARATOR,
+    HEADER,
+    POSE_RECORD,
+    is_binary,
+    read_header)
 
 ActorName = NewType('ActorName',str)
 
@@ -15,18 +24,51 @@ class SimulationState:
     def __repr__(self) -> str:
         return "".join(["SimulationState:", "\n", self.dumps()])
     
+    def get_actor(self, actor_name: ActorName) -> ActorState:
+        return self.actors[actor_name]
     
     @staticmethod
-    def deserialize(sim_state_str: str) -> SimulationState:
+    def deserialize(sim_state_str: str, actor_filter: Optional[AbstractSet[ActorName]] = None) -> SimulationState:
 
         sim_state_dict = orjson.loads(sim_state_str)
         actors: Dict[str, dict] = sim_state_dict["Actors"]
     
+        if actor_filter is not None:
+            actors = {actor_name: actors[actor_name] for actor_name in actor_filter if actor_name in actors}
+        
         for actor_name, actor_state_dict in actors.items():
             actors.update({actor_name: ActorState.deserialize_dict(actor_state_dict)})
         
         return SimulationState(sim_state_dict["Timestamp"], actors)
     
+    @staticmethod
+    def deserialize_bytes(sim_state_bytes: bytes, actor_filter: Optional[AbstractSet[ActorName]] = None) -> SimulationState:
+
+        timestamp, names, offset, extras_len = read_header(sim_state_bytes)
+        view = memoryview(sim_state_bytes)
+
+        poses_end = offset + len(names) * POSE_RECORD.size
+        poses = POSE_RECORD.iter_unpack(view[offset: poses_end])
+        
+        extras: Dict[str, dict] = orjson.loads(view[poses_end: poses_end + extras_len]) if extras_len else {}
+        
+        actors = {}
+        for name_idx, *pose in poses:
+            name = names[name_idx]
+            if actor_filter is not None and name not in actor_filter: continue
+            
+            actors[name] = ActorState.from_wire_extras(*pose, extras.get(name))
+        
+        return SimulationState(timestamp, actors)
+
+    @staticmethod
+    def decode(msg: bytes, wire_format: str = WireFormat.AUTO, actor_filter: Optional[AbstractSet[ActorName]] = None) -> SimulationState:
+
+        if wire_format == WireFormat.BINARY or (wire_format == WireFormat.AUTO and is_binary(msg)):
+            return SimulationState.deserialize_bytes(msg, actor_filter)
+        
+        return SimulationState.deserialize(msg, actor_filter)
+
     def dumps(self) -> str:
 
         sim_state = {
@@ -37,3 +79,44 @@ class SimulationState:
         }
         
         return orjson.dumps(sim_state, option=orjson.OPT_INDENT_2).decode()
+
+    def dumpb(self, flags: int = 0) -> bytes:
+
+        names = list(self.actors.keys())
+        names_bytes = NAME_SEPARATOR.join([name.encode() for name in names])
+        
+        poses = bytearray(len(names) * POSE_RECORD.size)
+        extras = {}
+        
+        for name_idx, name in enumerate(names):
+            actor = self.actors[name]
+            POSE_RECORD.pack_into(
+                poses, name_idx * POSE_RECORD.size,
+                name_idx,
+                actor.latitude,
+                actor.longitude,
+                actor.height_m,
+                actor.roll_rad,
+                actor.pitch_rad,
+                actor.yaw_rad)
+            
+            actor_extras = actor.wire_extras()
+            if actor_extras is not None: extras[name] = actor_extras
+        
+        extras_bytes = orjson.dumps(extras) if extras else b''
+        
+        header = HEADER.pack(
+            BINARY_MAGIC, BINARY_VERSION, flags,
+            self.timestamp,
+            len(names),
+            len(names_bytes),
+            len(extras_bytes))
+        
+        return b''.join([header, names_bytes, poses, extras_bytes])
+
+    def encode(self, wire_format: str = WireFormat.JSON) -> bytes:
+
+        if wire_format == WireFormat.BINARY:
+            return self.dumpb()
+        
+        return self.dumps().encode()
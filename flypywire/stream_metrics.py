@@ -0,0 +1,115 @@
+from __future__ import annotations
+import time
+import numpy as np
+from collections import deque
+from typing import Dict, Optional, Sequence
+
+# Receive-side metrics for stamped streams (Publisher(stamp_messages = True)).
+#
+# Latency compares the publisher's time.monotonic() with ours, so it is only meaningful
+# between processes on the same host. Loss, reordering and jitter only rely on sequence
+# numbers and time differences, so they hold across hosts too.
+
+MAX_TRACKED_GAP = 1024
+
+
+class StreamSource:
+
+    # Sequence state of one publisher; seqs within MAX_TRACKED_GAP of last_seq are either missing or seen
+
+    __slots__ = ('last_seq', 'last_transit', 'missing')
+
+    def __init__(self):
+
+        self.last_seq: Optional[int] = None
+        self.last_transit: Optional[float] = None
+        self.missing: set = set()
+
+
+class StreamMetrics:
+
+    def __init__(self, window: int = 10000):
+
+        self.window = window
+        self.reset()
+
+    def __repr__(self) -> str:
+
+        percentiles = ', '.join(f'p{p:g}: {1000 * value:.3f} ms' for p, value in self.latency_percentiles().items())
+        return (
+            f'StreamMetrics(received: {self.received}, lost: {self.lost}, reordered: {self.reordered}, '
+            f'duplicates: {self.duplicates}, restarts: {self.restarts}, jitter: {1000 * self.jitter:.3f} ms, {percentiles})')
+
+    def reset(self) -> None:
+
+        self.received = 0
+        self.lost = 0
+        self.reordered = 0
+        self.duplicates = 0
+        self.restarts = 0
+        self.jitter = 0.0
+
+        self.latencies: deque[float] = deque(maxlen = self.window) #type: ignore
+
+        # Keyed by publisher id, so several publishers behind a broker keep separate sequences
+        self.sources: Dict[int, StreamSource] = {}
+
+    @property
+    def loss_rate(self) -> float:
+
+        expected = self.received + self.lost
+        return self.lost / expected if expected else 0.0
+
+    def record(self, seq: int, send_time: float, recv_time: Optional[float] = None, source: int = 0) -> None:
+
+        if recv_time is None: recv_time = time.monotonic()
+
+        state = self.sources.get(source)
+        if state is None:
+            state = self.sources[source] = StreamSource()
+
+        # Every message of a per-actor topic frame carries the frame's sequence number
+        if seq == state.last_seq: return
+
+        if state.last_seq is not None and seq < state.last_seq:
+            if seq in state.missing:
+                state.missing.discard(seq)
+                self.lost -= 1
+                self.reordered += 1
+                self.received += 1
+                return
+
+            if seq > state.last_seq - MAX_TRACKED_GAP:
+                self.duplicates += 1
+                return
+
+            # Too far back to be a late or repeated message: the publisher started over
+            self.restarts += 1
+            state = self.sources[source] = StreamSource()
+
+        if state.last_seq is not None and seq > state.last_seq + 1:
+            gap = seq - state.last_seq - 1
+            self.lost += gap
+            if gap <= MAX_TRACKED_GAP: state.missing.update(range(state.last_seq + 1, seq))
+
+            # Late arrivals older than the tracked gaps are counted as lost for good
+            if len(state.missing) > MAX_TRACKED_GAP:
+                state.missing = {missing for missing in state.missing if missing > seq - MAX_TRACKED_GAP}
+
+        state.last_seq = seq
+        self.received += 1
+
+        # Interarrival jitter as in RFC 3550: smoothed variation of the transit time
+        transit = recv_time - send_time
+        if state.last_transit is not None:
+            self.jitter += (abs(transit - state.last_transit) - self.jitter) / 16
+        state.last_transit = transit
+
+        self.latencies.append(transit)
+
+    def latency_percentiles(self, percentiles: Sequence[float] = (50, 90, 99)) -> Dict[float, float]:
+
+        if not self.latencies: return {}
+
+        values = np.percentile(np.fromiter(self.latencies, dtype = np.float64), percentiles)
+        return dict(zip(percentiles, values.tolist()))
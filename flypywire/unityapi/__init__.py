@@ -7,5 +7,8 @@ from .unityengine_classes import (
 from . import assets
 from .actor import Actor
 from .client import Client
-from .context import RenderContext
-from .camera import Camera
+from .async_client import AsyncClient
+from .pipelined_client import PipelinedGameServices
+from .context import RenderContext, RenderBatch
+from .camera import Camera, CameraFrameWriter, SharedFrame
+from .local_server import LocalServer
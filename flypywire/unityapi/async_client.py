@@ -0,0 +1,109 @@
+import asyncio
+import orjson
+import zmq
+from functools import wraps
+from zmq_requests import Deserializers, ServiceRequest, ServiceResponse, RequestStatus
+from flypywire.async_pubsub import AsyncPublisher
+from flypywire.zmq_context import create_async_socket
+from flypywire.unityapi.game_services import GameServices
+
+
+def async_service_request(function: callable) -> callable:
+
+    # Awaitable counterpart of zmq_requests.service_request, same wire protocol
+    @wraps(function)
+    async def wrapper(self, *args, **kwargs):
+
+        service_args = {
+            **{arg: val for arg, val in zip(function.__code__.co_varnames[1:], args)},
+            **kwargs}
+
+        service_output = await self.request(function.__name__, service_args)
+
+        return Deserializers.deserialize(service_output, function.__annotations__['return'])
+
+    return wrapper
+
+
+class AsyncGameServices:
+
+    def __init__(self, address: str, timeout_ms: int = 5000):
+
+        self.address = address
+        self.timeout_ms = timeout_ms
+        self.socket = self._connect()
+
+        # A REQ socket only allows one request in flight
+        self._lock = asyncio.Lock()
+
+    def _connect(self) -> zmq.asyncio.Socket:
+
+        socket = create_async_socket(zmq.REQ, owner = self)
+        socket.connect(self.address)
+        return socket
+
+    async def request(self, service_name: str, service_args: dict) -> str:
+
+        async with self._lock:
+            await self.socket.send_string(ServiceRequest(service_name, service_args).dumps())
+
+            try:
+                reply = await asyncio.wait_for(self.socket.recv_string(), self.timeout_ms / 1000)
+
+            except asyncio.TimeoutError:
+                # A REQ socket that missed its reply is stuck; replace it
+                self.socket.close(linger = 0)
+                self.socket = self._connect()
+                raise zmq.error.Again()
+
+        response = ServiceResponse(**orjson.loads(reply))
+
+        if response.requestStatus != RequestStatus.SUCCESS:
+            raise Exception(f'Invalid request to service {service_name}. {response.serviceOutput}')
+
+        return response.serviceOutput
+
+    @async_service_request
+    def CheckClientConnection(self) -> None: ...
+
+    def close(self) -> None:
+        self.socket.close()
+
+
+for _name, _service in vars(GameServices).items():
+    if hasattr(_service, '__wrapped__'):
+        setattr(AsyncGameServices, _name, async_service_request(_service.__wrapped__))
+
+
+class AsyncClient:
+
+    def __init__(self, host: str = 'tcp://127.0.0.1', port: int = 5555, timeout_ms: int = 5000, debug = False):
+
+        self.host = host
+        self.port = port
+        self.req_port = port + 1
+        self.debug = debug
+
+        self.services = AsyncGameServices(f'{self.host}:{self.req_port}', timeout_ms)
+        self.publisher = AsyncPublisher(self.host, self.port, self.debug)
+
+    async def __aenter__(self):
+
+        await self.check_connection_with_server()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback) -> None:
+        self.close()
+
+    async def check_connection_with_server(self) -> None:
+
+        try:
+            await self.services.CheckClientConnection()
+
+        except zmq.error.Again:
+            raise Exception(f'Timeout. Client cannot establish connection to server at {self.host}:{self.port}')
+
+    def close(self) -> None:
+
+        self.services.close()
+        self.publisher.close()
@@ -0,0 +1,111 @@
+import orjson
+import zmq
+from functools import wraps
+from typing import Any, List, Tuple
+from zmq_requests import Deserializers, RequestStatus, ServiceRequest
+from flypywire.unityapi.game_services import GameServices
+
+# Service calls made inside a RenderBatch are queued and sent to the server in a single
+# ExecuteBatch request; the server runs them in order and answers with one
+# {'requestStatus', 'serviceOutput'} entry per operation. Servers without ExecuteBatch
+# get the operations one request at a time instead.
+
+
+def batched_service_request(function: callable) -> callable:
+
+    # Same argument mapping as zmq_requests.service_request, but the call is only recorded
+    @wraps(function)
+    def wrapper(self, *args, **kwargs) -> None:
+
+        service_args = {
+            **{arg: val for arg, val in zip(function.__code__.co_varnames[1:], args)},
+            **kwargs}
+
+        self.operations.append((function.__name__, service_args, function.__annotations__['return']))
+
+    return wrapper
+
+
+class BatchGameServices:
+
+    def __init__(self):
+        self.operations: List[Tuple[str, dict, Any]] = []
+
+    def take(self) -> List[Tuple[str, dict, Any]]:
+
+        operations, self.operations = self.operations, []
+        return operations
+
+
+for _name, _service in vars(GameServices).items():
+    if hasattr(_service, '__wrapped__') and _name != 'ExecuteBatch':
+        setattr(BatchGameServices, _name, batched_service_request(_service.__wrapped__))
+
+
+class BatchResult:
+
+    __slots__ = ('service_name', 'status', 'output', 'return_type')
+
+    def __init__(self, service_name: str, status: str, output: str, return_type: Any):
+
+        self.service_name = service_name
+        self.status = status
+        self.output = output
+        self.return_type = return_type
+
+    def __repr__(self) -> str:
+        return f'BatchResult(service: {self.service_name}, status: {self.status})'
+
+    @property
+    def ok(self) -> bool:
+        return self.status == RequestStatus.SUCCESS
+
+    @property
+    def value(self) -> Any:
+
+        if not self.ok:
+            raise Exception(f'Invalid request to service {self.service_name}. {self.output}')
+
+        return Deserializers.deserialize(self.output, self.return_type)
+
+
+def execute_sequentially(services: GameServices, operations: List[Tuple[str, dict, Any]]) -> List[dict]:
+
+    replies = []
+    for service_name, service_args, _ in operations:
+        services.socket.send_string(ServiceRequest(service_name, service_args).dumps())
+        replies.append(orjson.loads(services.socket.recv_string()))
+
+    return replies
+
+
+def execute_batch(services: GameServices, operations: List[Tuple[str, dict, Any]]) -> List[BatchResult]:
+
+    if not operations: return []
+
+    replies = None
+
+    if services.supports_batch is not False:
+        try:
+            replies = services.ExecuteBatch(orjson.dumps([
+                {'serviceName': service_name, 'serviceArgs': service_args}
+                for service_name, service_args, _ in operations]).decode())
+            
+            services.supports_batch = True
+
+        except zmq.error.Again:
+            raise
+
+        except Exception:
+            # An error on the very first batch means the server has no ExecuteBatch service
+            if services.supports_batch: raise
+            services.supports_batch = False
+
+    if replies is None: replies = execute_sequentially(services, operations)
+
+    if len(replies) != len(operations):
+        raise Exception(f'Invalid request to service ExecuteBatch. Got {len(replies)} results for {len(operations)} operations.')
+
+    return [
+        BatchResult(service_name, reply['requestStatus'], reply['serviceOutput'], return_type)
+        for (service_name, _, return_type), reply in zip(operations, replies)]
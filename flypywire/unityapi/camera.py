@@ -1,50 +1,345 @@
+from __future__ import annotations
 import numpy as np
 import zmq
 import cv2
 import time
-from queue import Queue
-from typing import Callable
-from threading import Thread
+import struct
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from queue import Empty
+from typing import Deque, Optional
+from threading import Thread, Event, Lock
+from flypywire.zmq_context import create_socket
+from flypywire.shm_transport import SharedMemoryRing, SLOT_HEADER, is_shm_address, shm_name
+
+# Raw frames in a shared-memory ring slot: height, width, channels, then uint8 pixels (BGR)
+FRAME_HEADER = struct.Struct('<III')
+
+
+def decode_frame(data: bytes) -> np.array:
+
+    img = cv2.imdecode(np.frombuffer(data, dtype = np.uint8), flags = cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError('Unable to decode camera frame.')
+
+    return img
+
+
+class DecodeStats:
+
+    def __init__(self, window: int = 60):
+
+        self.received = 0
+        self.decoded = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.errors = 0
+        self._decode_times: Deque[float] = deque(maxlen = window)
+
+    def __repr__(self) -> str:
+        return (
+            f'DecodeStats(received: {self.received}, decoded: {self.decoded}, skipped: {self.skipped}, '
+            f'dropped: {self.dropped}, errors: {self.errors}, decode_fps: {self.decode_fps:.1f})')
+
+    def record_decode(self) -> None:
+
+        self.decoded += 1
+        self._decode_times.append(time.monotonic())
+
+    @property
+    def decode_fps(self) -> float:
+
+        if len(self._decode_times) < 2: return 0.0
+
+        elapsed = self._decode_times[-1] - self._decode_times[0]
+        return (len(self._decode_times) - 1) / elapsed if elapsed > 0 else 0.0
+
+
+class SharedFrame:
+
+    # Zero-copy view of frame seq in a shared-memory ring. The writer reuses the slot once
+    # slot_count newer frames are written, so image is only meaningful while is_valid()
+
+    __slots__ = ('seq', 'image', 'ring')
+
+    def __init__(self, seq: int, image: np.array, ring: SharedMemoryRing):
+
+        self.seq = seq
+        self.image = image
+        self.ring = ring
+
+    def is_valid(self) -> bool:
+        return self.ring.buf is not None and self.ring.is_valid(self.seq)
+
+
+class PendingFrame:
+
+    # A received frame, still compressed; decode_ahead is its decode when it was started on arrival
+
+    __slots__ = ('seq', 'data', 'decode_ahead')
+
+    def __init__(self, seq: int, data: zmq.Frame):
+
+        self.seq = seq
+        self.data = data
+        self.decode_ahead: Optional[Future] = None
+
 
 class Camera:
 
-    def __init__(self, host: str = 'tcp://127.0.0.1', port: int = 2000):
+    def __init__(self,
+        host: str = 'tcp://127.0.0.1',
+        port: int = 2000,
+        queue_size: int = 10,
+        decode_workers: int = 2,
+        decode_executor: str = 'thread',
+        latest_only: bool = False):
         
         self.host = host
         self.port = port
+        self._close_window = False
+
+        # Frames stay compressed until get_image takes them, so frames pushed out by newer ones are never
+        # decoded: received = decoded + skipped + dropped + errors + frames still queued, where dropped
+        # counts frames decoded ahead (see decode_workers) and then pushed out anyway
+        self.stats = DecodeStats()
+
+        # Frames are numbered as they arrive; frames_skipped is how many of them the consumer never
+        # saw before the frame returned by the last get_image call
+        self.frames_skipped = 0
+
+        # host = 'shm://<name>' reads raw frames written on the same host by a CameraFrameWriter;
+        # any other scheme receives compressed frames over ZMQ from a (possibly remote) renderer
+        self.ring: Optional[SharedMemoryRing] = None
+        self._last_seq = 0
+        
+        if is_shm_address(host):
+            self.socket = None
+            return
 
-        self.socket = zmq.Context().socket(zmq.SUB)
+        self.socket = create_socket(zmq.SUB, owner = self)
         self.socket.connect(f'{self.host}:{self.port}')
         self.socket.setsockopt_string(zmq.SUBSCRIBE, "")
 
-        self.queue: Queue[np.array] = Queue(10)
-        self.thread = Thread(target = self._enqueue_imgs, daemon=True)
+        # latest_only keeps just the newest frame instead of the last queue_size ones. append/popleft
+        # on the deque are atomic, so neither the receive thread nor the consumer takes a lock
+        self.latest_only = latest_only
+        self._frames: Deque[PendingFrame] = deque(maxlen = 1 if latest_only else queue_size)
+        self._new_frame = Event()
+
+        # Frames are decoded on a pool of decode_workers ('thread' or 'process' workers), ahead of the consumer
+        # but only for the next decode_workers frames it will take, so decoding overlaps the consumer's work
+        # without decoding frames that are likely to be pushed out. Frames are still delivered in arrival order.
+        # decode_workers = 0 decodes on the thread calling get_image instead
+        self.decode_workers = decode_workers
+        self._executor: Optional[Executor] = None
+        self._decode_lock = Lock()
+        if decode_workers > 0:
+            self._executor = (ProcessPoolExecutor if decode_executor == 'process' else ThreadPoolExecutor)(decode_workers)
         
+        self._closed = False
+
+        self.thread = Thread(target = self._enqueue_imgs, daemon=True)
         self.thread.start()
-        self._close_window = False
     
+    @property
+    def _ring_attached(self) -> bool:
+
+        if self.ring is None:
+            try:
+                self.ring = SharedMemoryRing.attach(shm_name(f'{self.host}:{self.port}'))
+            
+            except FileNotFoundError:
+                return False
+        
+        return True
+
     @property
     def img_available(self) -> bool:
-        return not self.queue.empty()
-    
+        
+        if self.socket is None:
+            return self._ring_attached and self.ring.write_seq > self._last_seq
+        
+        return len(self._frames) > 0
+
+    @property
+    def frame_count(self) -> int:
+
+        # Frames received so far (written so far, for shared memory)
+        if self.socket is None:
+            return self.ring.write_seq if self._ring_attached else 0
+
+        return self.stats.received
+
+    def _discard(self, frame: PendingFrame) -> None:
+
+        if frame.decode_ahead is None or frame.decode_ahead.cancel():
+            self.stats.skipped += 1
+        
+        else:
+            self.stats.dropped += 1
+
+    def _decode_ahead(self) -> None:
+
+        # Keeps the head of the queue, the frames the consumer takes next, decoding on the pool. Called when a
+        # frame arrives and when the consumer takes one, so it goes on while the queue is full and frames move up.
+        # latest_only never decodes ahead: the newest frame is usually replaced before it is taken
+        if self._executor is None or self.latest_only: return
+
+        with self._decode_lock:
+            for i in range(self.decode_workers):
+                try:
+                    frame = self._frames[i]
+                
+                except IndexError:
+                    return
+                
+                if frame.decode_ahead is None:
+                    # Worker processes need a picklable copy; worker threads read the message buffer directly
+                    data = frame.data.bytes if isinstance(self._executor, ProcessPoolExecutor) else frame.data.buffer
+                    frame.decode_ahead = self._executor.submit(decode_frame, data)
+
+    def _push(self, frame: PendingFrame) -> None:
+
+        if len(self._frames) == self._frames.maxlen:
+            # Racing the consumer for the oldest frame: whoever pops it owns it
+            try:
+                with self._decode_lock: self._discard(self._frames.popleft())
+            
+            except IndexError:
+                pass
+
+        self._frames.append(frame)
+        self._decode_ahead()
+        self._new_frame.set()
+
+    def _recv_available(self) -> list:
+
+        # Waits for one frame (or close()), then takes whatever else is already queued in the socket
+        frames = []
+        while not self.socket.poll(100):
+            if self._closed: return frames
+        
+        while True:
+            try:
+                # zmq.Frame: the message buffer is decoded in place instead of being copied into bytes
+                frames.append(self.socket.recv(zmq.NOBLOCK, copy = False))
+            
+            except zmq.error.Again:
+                break
+        
+        self.stats.received += len(frames)
+        return frames
+
     def _enqueue_imgs(self) -> None:
 
         while True:
 
-            arr = np.frombuffer(self.socket.recv(), dtype = np.uint8)
+            try:
+                frames = self._recv_available()
             
-            if self.queue.full():
-                _ = self.queue.get_nowait()
-                self.queue.task_done()
+            except zmq.error.ZMQError:
+                # The shared context was terminated underneath us
+                if self.socket.closed: return
+                raise
             
-            self.queue.put(cv2.imdecode(arr, flags = cv2.IMREAD_COLOR))
+            if self._closed: return
+
+            first_seq = self.stats.received - len(frames) + 1
+            for seq, data in enumerate(frames, first_seq): self._push(PendingFrame(seq, data))
+
+    @property
+    def decode_fps(self) -> float:
+        return self.stats.decode_fps
     
-    def get_image(self) -> np.array:
+    def _get_shared_frame(self, wait: bool = False, deadline: Optional[float] = None) -> SharedFrame:
+
+        # The writer does not signal new frames, so waiting polls the ring
+        while not self.img_available:
+            if not wait or (deadline is not None and time.monotonic() >= deadline):
+                raise Empty
+            
+            time.sleep(0.001)
+
+        seq = self.ring.write_seq
+        slot = self.ring.view(seq)
+        if slot is None:
+            raise Empty
+
+        height, width, channels = FRAME_HEADER.unpack_from(slot)
+
+        return SharedFrame(seq, np.ndarray((height, width, channels), dtype = np.uint8, buffer = slot, offset = FRAME_HEADER.size), self.ring)
+
+    def _pop(self, wait: bool, deadline: Optional[float]) -> PendingFrame:
+
+        while True:
+            try:
+                return self._frames.popleft()
+            
+            except IndexError:
+                pass
+
+            if not wait or self._closed:
+                raise Empty
+
+            # Cleared before re-checking the deque, so a frame pushed in between still wakes us up
+            self._new_frame.clear()
+            if self._frames: continue
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if (remaining is not None and remaining <= 0) or not self._new_frame.wait(remaining):
+                raise Empty
+
+    def _decode(self, frame: PendingFrame) -> Optional[np.array]:
+
+        try:
+            img = frame.decode_ahead.result() if frame.decode_ahead is not None else decode_frame(frame.data.buffer)
         
-        img = self.queue.get_nowait()
-        self.queue.task_done()
+        except (ValueError, cv2.error):
+            self.stats.errors += 1
+            return None
+
+        self.stats.record_decode()
         return img
 
+    def get_image(self, wait: bool = False, timeout: Optional[float] = None) -> np.array:
+
+        # Raises queue.Empty when no frame is available (within timeout, if wait); see frames_skipped
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        if self.socket is None:
+            # Copied out of the ring, so the image is the caller's like over ZMQ; a slot rewritten
+            # while copying is retried with the newest frame
+            while True:
+                frame = self._get_shared_frame(wait, deadline)
+                seq, img = frame.seq, frame.image.copy()
+                if frame.is_valid(): break
+
+        else:
+            # Frames that fail to decode are counted in stats.errors and passed over
+            img = None
+            while img is None:
+                frame = self._pop(wait, deadline)
+                self._decode_ahead()
+                seq, img = frame.seq, self._decode(frame)
+
+        self._mark_taken(seq)
+        return img
+
+    def _mark_taken(self, seq: int) -> None:
+
+        self.frames_skipped = max(0, seq - self._last_seq - 1)
+        self._last_seq = seq
+
+    def get_shared_frame(self, wait: bool = False, timeout: Optional[float] = None) -> SharedFrame:
+
+        # Shared-memory cameras only: the newest frame as a view into the ring, without copying it
+        if self.socket is not None:
+            raise ValueError(f'{self.host}:{self.port} is not a shared-memory camera.')
+
+        frame = self._get_shared_frame(wait, None if timeout is None else time.monotonic() + timeout)
+        self._mark_taken(frame.seq)
+        return frame
 
     def imshow(self, winname: str = 'Camera') -> np.array:
         
@@ -59,6 +354,60 @@ class Camera:
             
             return frame
 
+    def close(self) -> None:
+
+        if self.ring is not None:
+            try:
+                self.ring.close()
+            
+            except BufferError:
+                # Frames returned by get_shared_frame() still reference the ring; it is released with them
+                pass
+            
+            self.ring = None
+        
+        if self.socket is not None:
+            # Wakes up consumers blocked in get_image(wait = True); they raise Empty
+            self._closed = True
+            self._new_frame.set()
+
+            # The receive thread owns the socket until it has seen _closed
+            self.thread.join()
+            self.socket.close(linger = 0)
+            
+            if self._executor is not None: self._executor.shutdown(wait = False, cancel_futures = True)
+
+
+class CameraFrameWriter:
+
+    # Same-host renderer side of the shared-memory camera transport
+
+    def __init__(self,
+        host: str = 'shm://camera',
+        port: int = 2000,
+        resolution_width: int = 640,
+        resolution_height: int = 480,
+        channels: int = 3,
+        slot_count: int = 4):
+
+        self.host = host
+        self.port = port
+        self.shape = (resolution_height, resolution_width, channels)
+        
+        slot_size = SLOT_HEADER.size + FRAME_HEADER.size + resolution_width * resolution_height * channels
+        self.ring = SharedMemoryRing.create(shm_name(f'{host}:{port}'), slot_count, slot_size)
+
+    def write(self, frame: np.array) -> int:
+
+        if frame.shape != self.shape:
+            raise ValueError(f'Expected a frame of shape {self.shape}, got {frame.shape}.')
+
+        return self.ring.write(FRAME_HEADER.pack(*self.shape), np.ascontiguousarray(frame, dtype = np.uint8))
+
+    def close(self) -> None:
+        self.ring.close()
+
+
 if __name__ == '__main__':
 
     cam = Camera(port = 2000)
@@ -66,4 +415,3 @@ if __name__ == '__main__':
     while True:
         
         cam.imshow()
-
@@ -2,13 +2,38 @@
 #! We get an error when import annotations!! It comes from service_request. Check how to solve it
 # from __future__ import annotations 
 import zmq
+import weakref
+from threading import Lock, local
+from typing import Set
 from zmq_requests import service_request
+from flypywire.zmq_context import create_socket, _unregister
 from flypywire import Publisher
 from flypywire.unityapi.context import RenderContext
+from flypywire.unityapi.pipelined_client import PipelinedGameServices
 from flypywire.actor_state import ActorState
 from flypywire.unityapi.unityengine_classes import Transform, Vector3, Color
 
 
+class ThreadSocket:
+
+    # Holds a thread's REQ socket in thread-local storage; the socket is closed when the thread ends
+    __slots__ = ('socket', '__weakref__')
+
+    def __init__(self, socket: zmq.Socket):
+        self.socket = socket
+
+    @staticmethod
+    def release(socket: zmq.Socket, sockets: Set[zmq.Socket], sockets_lock: Lock, owner: weakref.ref) -> None:
+
+        with sockets_lock:
+            sockets.discard(socket)
+            if not socket.closed: socket.close(linger = 0)
+
+        # A dead owner has already left the registry
+        client = owner()
+        if client is not None: _unregister(socket, client)
+
+
 ##TODO: Add a poller to Client in order to publish messages in a more controlled way. 
 ##TODO Get rid of time.sleep() for publishing in realtime
 class Client:
@@ -18,19 +43,60 @@ class Client:
         self.host = host
         self.port = port
         self.req_port = port + 1
+        self.timeout_ms = timeout_ms
         self.debug = debug
 
-        self.socket = zmq.Context().socket(zmq.REQ)
-        self.socket.connect(f'{self.host}:{self.req_port}')
-        self.socket.RCVTIMEO = timeout_ms
+        # One REQ socket per calling thread, since a REQ socket cannot interleave requests
+        self._local = local()
+        self._sockets: Set[zmq.Socket] = set()
+        self._sockets_lock = Lock()
 
         self.publisher = Publisher(self.host, self.port, self.debug)
 
         self._check_connection_with_server()
 
+    @property
+    def socket(self) -> zmq.Socket:
+
+        holder = getattr(self._local, 'holder', None)
+        if holder is None or holder.socket.closed:
+            holder = ThreadSocket(self._connect())
+            self._local.holder = holder
+            
+            # Thread-local storage is dropped when the thread ends, taking the holder with it
+            weakref.finalize(holder, ThreadSocket.release, holder.socket, self._sockets, self._sockets_lock, weakref.ref(self))
+
+        return holder.socket
+
+    def _connect(self) -> zmq.Socket:
+
+        socket = create_socket(zmq.REQ, owner = self)
         
-    def RenderContext(self, cleanup_on_exit: bool = True) -> RenderContext:
-        return RenderContext(self, cleanup_on_exit)
+        # After a timeout the socket may send again, and the late reply is discarded by request id
+        socket.setsockopt(zmq.REQ_RELAXED, 1)
+        socket.setsockopt(zmq.REQ_CORRELATE, 1)
+        socket.RCVTIMEO = self.timeout_ms
+        socket.connect(f'{self.host}:{self.req_port}')
+
+        with self._sockets_lock: self._sockets.add(socket)
+
+        return socket
+
+    def close(self) -> None:
+
+        with self._sockets_lock:
+            for socket in self._sockets:
+                socket.close()
+                _unregister(socket, self)
+            self._sockets.clear()
+
+        self.publisher.close()
+
+    def RenderContext(self, cleanup_on_exit: bool = True, cache_ttl_s: float = 0.0) -> RenderContext:
+        return RenderContext(self, cleanup_on_exit, cache_ttl_s)
+
+    def PipelinedServices(self, timeout_ms: int = 5000) -> PipelinedGameServices:
+        return PipelinedGameServices(f'{self.host}:{self.req_port}', timeout_ms, self.debug)
 
 
     @service_request
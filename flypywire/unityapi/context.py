@@ -1,7 +1,8 @@
 import time
-from typing import Union
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Union
 from flypywire import SimulationState
-from flypywire.unityapi.game_services import GameServices
+from flypywire.unityapi.game_services import ThreadLocalGameServices
 from flypywire.unityapi import (
     GeoCoordinate,
     Transform,
@@ -10,18 +11,25 @@ from flypywire.unityapi import (
     Actor)
 
 from flypywire.unityapi.camera import Camera
+from flypywire.unityapi.batch import BatchGameServices, BatchResult, execute_batch
+from flypywire.unityapi.query_cache import QueryCache, STATIC
 
 
 SimulationOrigin = GameObject('SimulationOrigin', None)
 
 class RenderContext:
 
-    def __init__(self, client, cleanup_on_exit: bool = True):
+    def __init__(self, client, cleanup_on_exit: bool = True, cache_ttl_s: float = 0.0):
 
         self.client = client
         self.publisher = self.client.publisher
         self.cleanup_on_exit = cleanup_on_exit
-        self.services = GameServices(self.client.socket)
+        self.services = ThreadLocalGameServices(self.client)
+        self._lock = Lock()
+        
+        # The assets library and the origin are cached for the whole session; transforms, positions
+        # and geocoordinates for cache_ttl_s, since published simulation states move actors too
+        self.cache = QueryCache(cache_ttl_s)
         
         self.actor_clone_count = dict()
 
@@ -45,12 +53,58 @@ class RenderContext:
         simulation_state: SimulationState,
         time_sleep_s: float = 0.03) -> None:
         
-        self.publisher.publish_simulation_state(simulation_state)
+        # The PUB socket is shared by every thread using this context
+        with self._lock: self.publisher.publish_simulation_state(simulation_state)
         if time_sleep_s > 0: time.sleep(time_sleep_s)
 
+    def batch(self, raise_on_error: bool = True) -> 'RenderBatch':
+        return RenderBatch(self, raise_on_error)
+
+    def spawn_gameobjects(self,
+        gameobjects: Sequence[GameObject],
+        transforms: Optional[Sequence[Transform]] = None,
+        geocoordinates: Optional[Sequence[GeoCoordinate]] = None,
+        relative_to: GameObject = SimulationOrigin,
+        attach: bool = False) -> List[BatchResult]:
+        
+        with self.batch() as batch:
+            for i, gameobject in enumerate(gameobjects):
+                batch.spawn_gameobject(
+                    gameobject,
+                    transforms[i] if transforms is not None else Transform(),
+                    geocoordinates[i] if geocoordinates is not None else None,
+                    relative_to,
+                    attach)
+        
+        return batch.results
+
+    def destroy_actors(self, actors: Sequence[Union[Actor,GameObject]]) -> List[BatchResult]:
+        
+        with self.batch() as batch:
+            for actor in actors: batch.destroy_actor(actor)
+        
+        return batch.results
+
+    def set_transforms(self, transforms: Dict[Union[Actor,GameObject], Transform]) -> List[BatchResult]:
+        
+        with self.batch() as batch:
+            for actor, transform in transforms.items(): batch.set_transform(actor, transform)
+        
+        return batch.results
+
+    def set_geocoordinates(self, geocoordinates: Dict[GameObject, GeoCoordinate]) -> List[BatchResult]:
+        
+        with self.batch() as batch:
+            for actor, geocoordinate in geocoordinates.items(): batch.set_geocoordinate(actor, geocoordinate)
+        
+        return batch.results
+
     
+    def invalidate_cache(self, actor: Optional[Union[Actor,GameObject]] = None) -> None:
+        self.cache.invalidate(actor.name if actor is not None else None)
+
     def get_assets_library(self) -> str:
-        return self.services.GetAssetsLibrary()
+        return self.cache.get_or_fetch(('assets',), self.services.GetAssetsLibrary, STATIC)
     
     def spawn_actor(self, actor: Actor, coordinate: GeoCoordinate) -> None:
 
@@ -64,6 +118,8 @@ class RenderContext:
             relative_to: GameObject = SimulationOrigin,
             attach: bool = False) -> None: ##TODO: make this function return an Actor
         
+        self.cache.invalidate(gameobject.name)
+        
         if geocoordinate:
             return self.services.SpawnGameObjectUsingGeoCoordinate(
                 gameobject.prefab,
@@ -85,31 +141,58 @@ class RenderContext:
                 relative_to.name)
     
     def destroy_actor(self, actor: Union[Actor,GameObject]) -> None:
+        
+        self.cache.invalidate(actor.name)
         return self.services.DestroyActor(actor.name)
     
     def destroy_all_actors(self) -> None:
+        
+        self.cache.invalidate_scene(keep = (('geocoordinate', SimulationOrigin.name),))
         return self.services.DestroyAllActors()
     
     def destroy_all_markers(self) -> None:
         return self.services.DestroyAllMarkers()
 
     def get_transform(self, actor: Union[Actor,GameObject]) -> Transform:
-        return self.services.GetTransform(actor.name)
+        return self.cache.get_or_fetch(('transform', actor.name), lambda: self.services.GetTransform(actor.name))
     
     def set_transform(self, actor: Union[Actor,GameObject], transform: Transform) -> None:
-        return self.services.SetTransform(actor.name, transform.dumps())
+        
+        # Write-through: the other views of the object's pose are now stale
+        output = self.services.SetTransform(actor.name, transform.dumps())
+        self.cache.invalidate(actor.name)
+        self.cache.put(('transform', actor.name), transform)
+        
+        return output
     
     def get_position(self, actor: Union[Actor,GameObject], relative_to: GameObject = SimulationOrigin) -> Vector3:
-        return self.services.GetPosition(actor.name, relative_to.name)
+        return self.cache.get_or_fetch(('position', actor.name, relative_to.name), lambda: self.services.GetPosition(actor.name, relative_to.name))
     
     def set_position(self, actor: Union[Actor,GameObject], position: Vector3, relative_to: GameObject = SimulationOrigin) -> None:
-        return self.services.SetPosition(actor.name, position.dumps(), relative_to.name)
+        
+        output = self.services.SetPosition(actor.name, position.dumps(), relative_to.name)
+        self.cache.invalidate(actor.name)
+        self.cache.put(('position', actor.name, relative_to.name), position)
+        
+        return output
 
     def get_geocoordinate(self, actor: GameObject) -> GeoCoordinate:
-        return self.services.GetGeoCoordinate(actor.name)
+        
+        return self.cache.get_or_fetch(
+            ('geocoordinate', actor.name),
+            lambda: self.services.GetGeoCoordinate(actor.name),
+            STATIC if actor.name == SimulationOrigin.name else None)
     
     def set_geocoordinate(self, actor: GameObject, geocoordinate: GeoCoordinate) -> None:
-        return self.services.SetGeoCoordinateUsingStrings(actor.name, geocoordinate.dumps())
+        
+        output = self.services.SetGeoCoordinateUsingStrings(actor.name, geocoordinate.dumps())
+        
+        # Moving the origin moves every object relative to it
+        if actor.name == SimulationOrigin.name: self.cache.invalidate_scene()
+        else: self.cache.invalidate(actor.name)
+        self.cache.put(('geocoordinate', actor.name), geocoordinate)
+        
+        return output
     
     def get_origin(self) -> GeoCoordinate:
         return self.get_geocoordinate(SimulationOrigin)
@@ -119,11 +202,12 @@ class RenderContext:
     
     def freeze_actor(self, actor: Union[Actor,GameObject], lifetime: float = -1) -> None:
 
-        if actor.name in self.actor_clone_count:
-            self.actor_clone_count[actor.name] += 1
-        else: 
-            self.actor_clone_count[actor.name] = 1
-        clone_name = f"{actor.name}.clone[{self.actor_clone_count.get(actor.name)}]"
+        with self._lock:
+            if actor.name in self.actor_clone_count:
+                self.actor_clone_count[actor.name] += 1
+            else: 
+                self.actor_clone_count[actor.name] = 1
+            clone_name = f"{actor.name}.clone[{self.actor_clone_count.get(actor.name)}]"
         return self.services.FreezeActor(actor.name, clone_name, lifetime)
     
     def spawn_camera(self,
@@ -165,4 +249,45 @@ class RenderContext:
         
         return axes
 
-        
\ No newline at end of file
+
+class RenderBatch(RenderContext):
+
+    # Queues the service calls of a RenderContext and sends them in one ExecuteBatch request:
+    #   with ctx.batch() as batch:
+    #       for balloon in balloons: batch.spawn_gameobject(balloon, geocoordinate = ...)
+    # Getters return None inside the batch; their values are in batch.results afterwards.
+
+    def __init__(self, context: RenderContext, raise_on_error: bool = True):
+
+        self.context = context
+        self.client = context.client
+        self.publisher = context.publisher
+        self.cleanup_on_exit = False
+        self.services = BatchGameServices()
+        self.cache = QueryCache(enabled = False)
+        self.actor_clone_count = context.actor_clone_count
+        self._lock = context._lock
+
+        self.raise_on_error = raise_on_error
+        self.results: List[BatchResult] = []
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        if exc_type is None: self.flush()
+
+    def flush(self) -> List[BatchResult]:
+
+        operations = self.services.take()
+        results = execute_batch(self.context.services, operations)
+        self.results.extend(results)
+        
+        # Queued writes bypassed the context cache
+        if any(service_args.get('gameObjectName') == SimulationOrigin.name for _, service_args, _ in operations):
+            self.context.cache.invalidate_scene()
+        elif operations:
+            self.context.cache.invalidate_scene(keep = (('geocoordinate', SimulationOrigin.name),))
+
+        if self.raise_on_error:
+            for result in results:
+                if not result.ok: raise Exception(f'Invalid request to service {result.service_name}. {result.output}')
+
+        return results
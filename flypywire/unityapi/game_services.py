@@ -1,4 +1,3 @@
-import orjson
 from zmq import Socket
 from zmq_requests import service_request, Deserializers
 
@@ -8,16 +7,16 @@ from flypywire.unityapi.unityengine_classes import (
     GeoCoordinate,
     Color)
 
-def str_to_geocoordinate(val_str: str) -> GeoCoordinate:
-    lon_lat_height = orjson.loads(val_str)
-    return GeoCoordinate(lon_lat_height["Latitude"], lon_lat_height["Longitude"], lon_lat_height["Height"])
-
-Deserializers.add_deserializer(Vector3, lambda val_str: Vector3(**orjson.loads(val_str)))
-Deserializers.add_deserializer(GeoCoordinate, lambda val_str: str_to_geocoordinate(val_str))
-Deserializers.add_deserializer(Transform, lambda val_str: Transform(Vector3(**orjson.loads(val_str)['position']), Vector3(**orjson.loads(val_str)['rotation'])))
+Deserializers.add_deserializer(Vector3, Vector3.loads)
+Deserializers.add_deserializer(GeoCoordinate, GeoCoordinate.loads)
+Deserializers.add_deserializer(Transform, Transform.loads)
+Deserializers.add_deserializer(Color, Color.loads)
 
 class GameServices:
 
+    # Whether the server implements ExecuteBatch; None until the first batch tells (see batch.execute_batch)
+    supports_batch = None
+
     def __init__(self, socket: Socket):
 
         self.socket = socket
@@ -82,4 +81,19 @@ class GameServices:
         label: str,
         parentName: str,
         lifetime: float,
-        rightHand: bool) -> None: ...
\ No newline at end of file
+        rightHand: bool) -> None: ...
+
+    @service_request
+    def ExecuteBatch(self, operations: str) -> list: ...
+
+
+class ThreadLocalGameServices(GameServices):
+
+    # Looks the client's socket up on every call, so each thread talks through its own REQ socket
+    def __init__(self, client):
+
+        self.client = client
+
+    @property
+    def socket(self) -> Socket:
+        return self.client.socket
@@ -0,0 +1,445 @@
+from __future__ import annotations
+import argparse
+import logging
+import math
+import random
+import time
+import cv2
+import numpy as np
+import orjson
+import zmq
+from threading import Thread, Event, RLock
+from typing import Any, Dict, List, Optional
+from zmq_requests import RequestStatus
+
+from flypywire.simulation_state import SimulationState
+from flypywire.sim_state_pubsub import Subscriber
+from flypywire.shm_transport import is_shm_address
+from flypywire.zmq_context import create_socket
+from flypywire.unityapi import assets
+from flypywire.unityapi.camera import CameraFrameWriter
+
+# Pure-Python stand-in for the Unity server, for tests, load tests and CI runs without a
+# renderer. Like Unity, it answers the GameServices protocol on port + 1, subscribes to
+# the SimulationState stream published on port, and publishes encoded frames for every
+# spawned camera on the camera's own port. It keeps a minimal scene: spawned objects with
+# their prefab, parent, transform and geocoordinate, plus markers drawn with DrawAxes.
+
+SIMULATION_ORIGIN = 'SimulationOrigin'
+IDENTITY_TRANSFORM = {'position': {'x': 0, 'y': 0, 'z': 0}, 'rotation': {'x': 0, 'y': 0, 'z': 0}}
+
+
+def _assets_library() -> List[str]:
+
+    return [
+        address
+        for category in vars(assets).values() if isinstance(category, type)
+        for name, address in vars(category).items() if not name.startswith('_')]
+
+
+class SceneObject:
+
+    __slots__ = ('name', 'prefab', 'parent', 'transform', 'geocoordinate')
+
+    def __init__(self, name: str, prefab: Optional[str], parent: Optional[str] = None,
+        transform: Optional[dict] = None, geocoordinate: Optional[dict] = None):
+
+        self.name = name
+        self.prefab = prefab
+        self.parent = parent
+        self.transform = transform if transform is not None else IDENTITY_TRANSFORM
+        self.geocoordinate = geocoordinate
+
+
+class SyntheticCamera:
+
+    # Publishes a moving test pattern, encoded like the Unity cameras (cv2.imencode), at frame_rate
+
+    def __init__(self,
+        host: str,
+        port: int,
+        resolution_width: int,
+        resolution_height: int,
+        frame_rate: float = 30.0,
+        encoding: str = '.jpg'):
+
+        self.host = host
+        self.port = port
+        self.frame_rate = frame_rate
+        self.encoding = encoding
+        self.frames_sent = 0
+
+        # Same-host consumers can read raw frames from shared memory instead
+        if is_shm_address(host):
+            self.writer = CameraFrameWriter(host, port, resolution_width, resolution_height)
+            self.socket = None
+
+        else:
+            self.writer = None
+            self.socket = create_socket(zmq.PUB, owner = self)
+            self.socket.bind(f'{host}:{port}')
+
+        rows = np.linspace(0, 255, resolution_height, dtype = np.uint8)[:, None]
+        cols = np.linspace(0, 255, resolution_width, dtype = np.uint8)[None, :]
+        self._background = np.dstack([
+            np.broadcast_to(cols, (resolution_height, resolution_width)),
+            np.broadcast_to(rows, (resolution_height, resolution_width)),
+            np.full((resolution_height, resolution_width), 96, dtype = np.uint8)])
+
+        self._stop_event = Event()
+        self._thread = Thread(target = self._run, daemon = True)
+        self._thread.start()
+
+    def render(self) -> np.ndarray:
+
+        frame = self._background.copy()
+        width = frame.shape[1]
+        x = (self.frames_sent * 8) % width
+        frame[:, x: x + 8] = 255
+        cv2.putText(frame, str(self.frames_sent), (8, 24), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+
+        return frame
+
+    def _run(self) -> None:
+
+        period = 1 / self.frame_rate
+        next_frame = time.monotonic()
+
+        while not self._stop_event.wait(max(0.0, next_frame - time.monotonic())):
+            next_frame += period
+            frame = self.render()
+
+            if self.writer is not None:
+                self.writer.write(frame)
+
+            else:
+                self.socket.send(cv2.imencode(self.encoding, frame)[1].tobytes())
+
+            self.frames_sent += 1
+
+    def close(self) -> None:
+
+        self._stop_event.set()
+        self._thread.join()
+
+        if self.writer is not None: self.writer.close()
+        if self.socket is not None: self.socket.close(linger = 0)
+
+
+class LocalServer:
+
+    def __init__(self,
+        host: str = 'tcp://127.0.0.1',
+        port: int = 5555,
+        poll_timeout_ms: int = 100,
+        latency_s: float = 0.0,
+        latency_jitter_s: float = 0.0,
+        service_latency_s: Optional[Dict[str, float]] = None,
+        frame_rate: float = 30.0,
+        frame_encoding: str = '.jpg',
+        subscribe_states: bool = True,
+        debug: bool = False):
+
+        self.host = host
+        self.port = port
+        self.req_port = port + 1
+        self.poll_timeout_ms = poll_timeout_ms
+        self.debug = debug
+
+        # Injected before every reply: latency_s (or the service's own entry) plus uniform jitter
+        self.latency_s = latency_s
+        self.latency_jitter_s = latency_jitter_s
+        self.service_latency_s = service_latency_s if service_latency_s is not None else {}
+
+        self.frame_rate = frame_rate
+        self.frame_encoding = frame_encoding
+
+        self.socket = create_socket(zmq.REP, owner = self)
+        self.socket.bind(f'{self.host}:{self.req_port}')
+
+        self.scene: Dict[str, SceneObject] = {
+            SIMULATION_ORIGIN: SceneObject(SIMULATION_ORIGIN, None, geocoordinate = {'Latitude': 0, 'Longitude': 0, 'Height': 0})}
+        self.markers: Dict[str, SceneObject] = {}
+        self.cameras: Dict[str, SyntheticCamera] = {}
+        self.requests_served = 0
+
+        self.last_state: Optional[SimulationState] = None
+        self.states_received = 0
+        self._scene_lock = RLock()
+
+        self._stop_event = Event()
+        self._thread: Optional[Thread] = None
+        self._state_thread: Optional[Thread] = None
+        self.subscriber = Subscriber(self.host, self.port) if subscribe_states else None
+
+    def __str__(self) -> str:
+        return f'LocalServer(address: {self.host}:{self.req_port})'
+
+    def __enter__(self) -> LocalServer:
+
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        self.close()
+
+    def _get(self, name: str) -> SceneObject:
+
+        if name not in self.scene:
+            raise ValueError(f'GameObject {name} not found.')
+
+        return self.scene[name]
+
+    def _spawn(self, prefab: str, name: str, parent: Optional[str] = None,
+        transform: Optional[dict] = None, geocoordinate: Optional[dict] = None) -> None:
+
+        if name in self.scene:
+            raise ValueError(f'GameObject {name} already exists.')
+
+        if parent is not None: self._get(parent)
+
+        self.scene[name] = SceneObject(name, prefab, parent, transform, geocoordinate)
+
+    def _destroy(self, name: str) -> None:
+
+        del self.scene[name]
+        if name in self.cameras: self.cameras.pop(name).close()
+
+    # SimulationState consumption
+
+    def apply_simulation_state(self, state: SimulationState) -> None:
+
+        # Actors that are in the scene follow the published poses, as the Unity actors do
+        with self._scene_lock:
+            for actor_name, actor in state.actors.items():
+                if actor_name not in self.scene: continue
+
+                scene_object = self.scene[actor_name]
+                scene_object.geocoordinate = {'Latitude': actor.latitude, 'Longitude': actor.longitude, 'Height': actor.height_m}
+                scene_object.transform = {
+                    'position': scene_object.transform['position'],
+                    'rotation': {
+                        'x': math.degrees(actor.pitch_rad),
+                        'y': math.degrees(actor.yaw_rad),
+                        'z': math.degrees(actor.roll_rad)}}
+
+            self.last_state = state
+            self.states_received += 1
+
+    def _consume_states(self) -> None:
+
+        while self.subscriber.wait_for_data():
+            self.apply_simulation_state(self.subscriber.get_simulation_state())
+
+    # Services, named and called as in GameServices
+
+    def CheckClientConnection(self) -> None: ...
+
+    def GetAssetsLibrary(self) -> list:
+        return _assets_library()
+
+    def SpawnGameObjectUsingGeoCoordinate(self, prefabName: str, roleName: str, geoCoordinate: str) -> None:
+        self._spawn(prefabName, roleName, geocoordinate = orjson.loads(geoCoordinate))
+
+    def SpawnGameObjectAttachedToParent(self, prefabName: str, roleName: str, transform: str, parentName: str) -> None:
+        self._spawn(prefabName, roleName, parentName, orjson.loads(transform))
+
+    def SpawnGameObjectRelativeToOther(self, prefabName: str, roleName: str, transform: str, otherName: str) -> None:
+
+        self._get(otherName)
+        self._spawn(prefabName, roleName, None, orjson.loads(transform))
+
+    def DestroyActor(self, actorName: str) -> None:
+
+        self._get(actorName)
+        self._destroy(actorName)
+
+    def DestroyAllActors(self) -> None:
+
+        for name in list(self.scene):
+            if name != SIMULATION_ORIGIN: self._destroy(name)
+
+    def DestroyAllMarkers(self) -> None:
+        self.markers = {}
+
+    def GetTransform(self, gameObjectName: str) -> dict:
+        return self._get(gameObjectName).transform
+
+    def SetTransform(self, gameObjectName: str, transform: str) -> None:
+        self._get(gameObjectName).transform = orjson.loads(transform)
+
+    def GetPosition(self, gameObjectName: str, relativeTo: str) -> dict:
+
+        position = self._get(gameObjectName).transform['position']
+        origin = self._get(relativeTo).transform['position']
+
+        return {axis: position[axis] - origin[axis] for axis in 'xyz'}
+
+    def SetPosition(self, gameObjectName: str, position: str, relativeTo: str) -> None:
+
+        position = orjson.loads(position)
+        origin = self._get(relativeTo).transform['position']
+        scene_object = self._get(gameObjectName)
+
+        scene_object.transform = {
+            'position': {axis: position[axis] + origin[axis] for axis in 'xyz'},
+            'rotation': scene_object.transform['rotation']}
+
+    def GetGeoCoordinate(self, gameObjectName: str) -> dict:
+
+        geocoordinate = self._get(gameObjectName).geocoordinate
+        return geocoordinate if geocoordinate is not None else self.scene[SIMULATION_ORIGIN].geocoordinate
+
+    def SetGeoCoordinateUsingStrings(self, gameObjectName: str, geoCoordinate: str) -> None:
+        self._get(gameObjectName).geocoordinate = orjson.loads(geoCoordinate)
+
+    def FreezeActor(self, actorName: str, cloneName: str, lifetime: float) -> None:
+
+        actor = self._get(actorName)
+        self._spawn(actor.prefab, cloneName, actor.parent, actor.transform, actor.geocoordinate)
+
+    def SpawnCamera(self,
+        label: str,
+        parentName: str,
+        transform: str,
+        host: str,
+        port: int,
+        resolutionWidth: int,
+        resolutionHeight: int) -> None:
+
+        self._spawn(None, label, parentName, orjson.loads(transform))
+        self.cameras[label] = SyntheticCamera(host, port, resolutionWidth, resolutionHeight, self.frame_rate, self.frame_encoding)
+
+    def DrawAxes(self,
+        transform: str,
+        width: float,
+        size: float,
+        label: str,
+        parentName: str,
+        lifetime: float,
+        rightHand: bool) -> None:
+
+        self._get(parentName)
+        self.markers[label] = SceneObject(label, None, parentName, orjson.loads(transform))
+
+    def ExecuteBatch(self, operations: str) -> list:
+        return [self._dispatch(operation['serviceName'], operation['serviceArgs']) for operation in orjson.loads(operations)]
+
+    # Protocol
+
+    def _dispatch(self, service_name: str, service_args: dict) -> Dict[str, str]:
+
+        service = getattr(self, service_name, None) if service_name[:1].isupper() else None
+
+        if service is None:
+            return {'requestStatus': RequestStatus.ERROR, 'serviceOutput': f'Unknown service {service_name}.'}
+
+        try:
+            with self._scene_lock: output = service(**service_args)
+
+        except Exception as exc:
+            return {'requestStatus': RequestStatus.ERROR, 'serviceOutput': str(exc)}
+
+        return {'requestStatus': RequestStatus.SUCCESS, 'serviceOutput': self._serialize(output)}
+
+    @staticmethod
+    def _serialize(output: Any) -> str:
+
+        if output is None: return ''
+        if isinstance(output, str): return output
+        if isinstance(output, (list, dict)): return orjson.dumps(output).decode()
+
+        return str(output)
+
+    def _inject_latency(self, service_name: str) -> None:
+
+        latency_s = self.service_latency_s.get(service_name, self.latency_s)
+        if self.latency_jitter_s: latency_s += random.uniform(0, self.latency_jitter_s)
+        if latency_s > 0: time.sleep(latency_s)
+
+    def handle_request(self, request: bytes) -> bytes:
+
+        self.requests_served += 1
+        request = orjson.loads(request)
+
+        if self.debug: logging.info(msg = f'{self} serving {request["serviceName"]}')
+
+        self._inject_latency(request['serviceName'])
+
+        return orjson.dumps(self._dispatch(request['serviceName'], request['serviceArgs']))
+
+    def run(self) -> None:
+
+        logging.info(msg = f'Running {self}')
+
+        while not self._stop_event.is_set():
+            try:
+                if not self.socket.poll(self.poll_timeout_ms): continue
+                self.socket.send(self.handle_request(self.socket.recv()))
+
+            except zmq.ZMQError:
+                if self.socket.closed: return
+                raise
+
+    def start_consuming_states(self) -> None:
+
+        if self.subscriber is None or self._state_thread is not None: return
+
+        self.subscriber.start_listening()
+        self._state_thread = Thread(target = self._consume_states, daemon = True)
+        self._state_thread.start()
+
+    def start(self) -> None:
+
+        self.start_consuming_states()
+        self._thread = Thread(target = self.run, daemon = True)
+        self._thread.start()
+
+    def close(self) -> None:
+
+        self._stop_event.set()
+        if self._thread is not None: self._thread.join()
+
+        if self.subscriber is not None: self.subscriber.close()
+        if self._state_thread is not None: self._state_thread.join()
+
+        for camera in self.cameras.values(): camera.close()
+        self.cameras = {}
+
+        self.socket.close()
+        logging.info(msg = f'Closing {self}')
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+
+    parser = argparse.ArgumentParser(description = 'flypywire local stand-in server')
+    parser.add_argument('--host', default = 'tcp://127.0.0.1')
+    parser.add_argument('--port', type = int, default = 5555, help = 'publisher port; services are served on port + 1')
+    parser.add_argument('--latency', type = float, default = 0.0, help = 'seconds added before every reply')
+    parser.add_argument('--latency-jitter', type = float, default = 0.0, help = 'uniform jitter added to the latency, in seconds')
+    parser.add_argument('--frame-rate', type = float, default = 30.0, help = 'frames per second published by each camera')
+    parser.add_argument('--frame-encoding', default = '.jpg', help = 'cv2.imencode extension of the camera frames')
+    parser.add_argument('--debug', action = 'store_true')
+    args = parser.parse_args(argv)
+
+    server = LocalServer(
+        args.host, args.port,
+        latency_s = args.latency,
+        latency_jitter_s = args.latency_jitter,
+        frame_rate = args.frame_rate,
+        frame_encoding = args.frame_encoding,
+        debug = args.debug)
+
+    try:
+        server.start_consuming_states()
+        server.run()
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
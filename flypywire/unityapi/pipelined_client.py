@@ -0,0 +1,206 @@
+import itertools
+import logging
+import struct
+import time
+import orjson
+import zmq
+from collections import deque
+from concurrent.futures import Future
+from functools import wraps
+from threading import Thread, Event, Lock
+from typing import Any, Deque, Dict, Optional
+from zmq_requests import Deserializers, ServiceRequest, ServiceResponse, RequestStatus
+from flypywire.zmq_context import create_socket
+from flypywire.unityapi.game_services import GameServices
+
+# GameServices over a DEALER socket: requests are sent as soon as they are made and
+# each call returns a concurrent.futures.Future, so many calls can be in flight.
+#
+# The server side is a REP socket, which echoes the whole DEALER envelope back with its
+# reply. Each request is sent as [call id, b'', payload], so replies are matched to calls
+# by the echoed id: a lost reply only fails its own call, and the late reply of a call
+# that timed out is discarded.
+
+_call_ids = itertools.count(1)
+
+
+def future_service_request(function: callable) -> callable:
+
+    # Same argument mapping as zmq_requests.service_request; timeout_ms is reserved per call
+    @wraps(function)
+    def wrapper(self, *args, timeout_ms: Optional[int] = None, **kwargs) -> Future:
+
+        service_args = {
+            **{arg: val for arg, val in zip(function.__code__.co_varnames[1:], args)},
+            **kwargs}
+
+        return self.request(function.__name__, service_args, function.__annotations__['return'], timeout_ms)
+
+    return wrapper
+
+
+class PendingCall:
+
+    __slots__ = ('call_id', 'service_name', 'return_type', 'future', 'deadline')
+
+    ID = struct.Struct('<Q')
+
+    def __init__(self, service_name: str, return_type: Any, deadline: float):
+
+        self.call_id = next(_call_ids)
+        self.service_name = service_name
+        self.return_type = return_type
+        self.future = Future()
+        self.deadline = deadline
+
+    @property
+    def envelope_id(self) -> bytes:
+        return PendingCall.ID.pack(self.call_id)
+
+
+class PipelinedGameServices:
+
+    def __init__(self, address: str, timeout_ms: int = 5000, debug: bool = False):
+
+        self.address = address
+        self.timeout_ms = timeout_ms
+        self.debug = debug
+
+        # Only the I/O thread touches the DEALER socket; callers hand requests over through inproc
+        self.socket = create_socket(zmq.DEALER, owner = self)
+        self.socket.connect(address)
+
+        inproc_address = f'inproc://flypywire-pipeline-{id(self)}'
+        self._inbox = create_socket(zmq.PULL, owner = self)
+        self._inbox.bind(inproc_address)
+        self._outbox = create_socket(zmq.PUSH, owner = self)
+        self._outbox.connect(inproc_address)
+
+        self._submit_lock = Lock()
+        self._submitted: Deque[PendingCall] = deque()
+        self._in_flight: Dict[bytes, PendingCall] = {}
+
+        self._stop_event = Event()
+        self._io_thread = Thread(target = self._run, daemon = True)
+        self._io_thread.start()
+
+    def __str__(self) -> str:
+        return f'PipelinedGameServices(address: {self.address})'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        self.close()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight) + len(self._submitted)
+
+    def request(self, service_name: str, service_args: dict, return_type: Any = str, timeout_ms: Optional[int] = None) -> Future:
+
+        if self._stop_event.is_set():
+            raise RuntimeError(f'{self} is closed.')
+
+        timeout_ms = timeout_ms if timeout_ms is not None else self.timeout_ms
+        call = PendingCall(service_name, return_type, time.monotonic() + timeout_ms / 1000)
+        payload = ServiceRequest(service_name, service_args).dumps().encode()
+
+        # Calls must be queued in the same order as their requests reach the I/O thread
+        with self._submit_lock:
+            self._submitted.append(call)
+            self._outbox.send(payload)
+
+        return call.future
+
+    @staticmethod
+    def _resolve(call: PendingCall, reply: bytes) -> None:
+
+        if call.future.done(): return
+
+        # Runs on the I/O thread: a malformed reply must fail its own call, not the thread
+        try:
+            response = ServiceResponse(**orjson.loads(reply))
+
+            if response.requestStatus != RequestStatus.SUCCESS:
+                call.future.set_exception(Exception(f'Invalid request to service {call.service_name}. {response.serviceOutput}'))
+                return
+
+            call.future.set_result(Deserializers.deserialize(response.serviceOutput, call.return_type))
+
+        except Exception as exc:
+            call.future.set_exception(exc)
+
+    def _expire(self, now: float) -> None:
+
+        for envelope_id, call in list(self._in_flight.items()):
+            if call.deadline <= now:
+                # Forgotten here, so its reply is dropped if it ever arrives
+                del self._in_flight[envelope_id]
+                if not call.future.done(): call.future.set_exception(zmq.error.Again())
+                if self.debug: logging.info(msg = f'{self}: call {call.call_id} to {call.service_name} timed out')
+
+    def _poll_timeout_ms(self) -> int:
+
+        pending = [call.deadline for call in self._in_flight.values()]
+        if not pending: return 100
+
+        return max(0, min(100, int(1000 * (min(pending) - time.monotonic())) + 1))
+
+    def _run(self) -> None:
+
+        poller = zmq.Poller()
+        poller.register(self._inbox, zmq.POLLIN)
+        poller.register(self.socket, zmq.POLLIN)
+
+        while not self._stop_event.is_set():
+            try:
+                events = dict(poller.poll(self._poll_timeout_ms()))
+
+                if self._inbox in events:
+                    while True:
+                        try: payload = self._inbox.recv(zmq.NOBLOCK)
+                        except zmq.error.Again: break
+
+                        with self._submit_lock: call = self._submitted.popleft()
+                        self._in_flight[call.envelope_id] = call
+                        self.socket.send_multipart([call.envelope_id, b'', payload])
+
+                if self.socket in events:
+                    while True:
+                        try: frames = self.socket.recv_multipart(zmq.NOBLOCK)
+                        except zmq.error.Again: break
+
+                        call = self._in_flight.pop(frames[0], None)
+                        if call is not None:
+                            self._resolve(call, frames[-1])
+
+                        elif self.debug:
+                            logging.info(msg = f'{self}: dropped a reply to an unknown or expired call')
+
+                self._expire(time.monotonic())
+
+            except zmq.ZMQError:
+                if self.socket.closed: return
+                raise
+
+    def close(self) -> None:
+
+        self._stop_event.set()
+        if self._io_thread.is_alive(): self._io_thread.join()
+
+        for call in [*self._in_flight.values(), *self._submitted]:
+            if not call.future.done(): call.future.set_exception(RuntimeError(f'{self} is closed.'))
+
+        self._in_flight.clear()
+        self._submitted.clear()
+
+        for socket in (self._outbox, self._inbox, self.socket): socket.close(linger = 0)
+
+    @future_service_request
+    def CheckClientConnection(self) -> None: ...
+
+
+for _name, _service in vars(GameServices).items():
+    if hasattr(_service, '__wrapped__'):
+        setattr(PipelinedGameServices, _name, future_service_request(_service.__wrapped__))
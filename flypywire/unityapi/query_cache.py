@@ -0,0 +1,71 @@
+import copy
+import time
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# Cache for RenderContext queries. Keys are tuples whose first item is the query kind
+# and the rest (if any) the names of the game objects the query depends on, e.g. an
+# object and the one its position is measured from, so one object can be invalidated
+# without touching the others. Each lookup passes its own TTL.
+#
+# Values are copied in and out, so callers may modify what they get without touching the cache.
+
+STATIC = float('inf')
+
+
+class QueryCache:
+
+    def __init__(self, ttl_s: float = 0.0, enabled: bool = True):
+
+        self.ttl_s = ttl_s
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[Tuple[Hashable, ...], Tuple[float, Any]] = {}
+        self._lock = Lock()
+
+    def __repr__(self) -> str:
+        return f'QueryCache(entries: {len(self._entries)}, hits: {self.hits}, misses: {self.misses})'
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, key: Tuple[Hashable, ...], value: Any) -> None:
+
+        if not self.enabled: return
+
+        value = copy.deepcopy(value)
+        with self._lock: self._entries[key] = (time.monotonic(), value)
+
+    def get_or_fetch(self, key: Tuple[Hashable, ...], fetch: Callable[[], Any], ttl_s: Optional[float] = None) -> Any:
+
+        ttl_s = ttl_s if ttl_s is not None else self.ttl_s
+
+        entry = self._entries.get(key) if self.enabled and ttl_s > 0 else None
+
+        if entry is not None:
+            stored_at, value = entry
+            if time.monotonic() - stored_at < ttl_s:
+                self.hits += 1
+                return copy.deepcopy(value)
+
+        self.misses += 1
+        value = fetch()
+        self.put(key, value)
+
+        return value
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+
+        with self._lock:
+            if name is None:
+                self._entries = {}
+                return
+
+            self._entries = {key: entry for key, entry in self._entries.items() if name not in key[1:]}
+
+    def invalidate_scene(self, keep: Tuple[Tuple[Hashable, ...], ...] = ()) -> None:
+
+        # Drops every per-object entry; kind-only entries (e.g. the assets library) and keep survive
+        with self._lock:
+            self._entries = {key: entry for key, entry in self._entries.items() if len(key) == 1 or key in keep}
@@ -1,6 +1,18 @@
 from __future__ import annotations
 import orjson
-from dataclasses import dataclass, asdict
+import struct
+from dataclasses import dataclass, asdict, field
+
+# Each class encodes itself straight from its fields (dumps/pack) and decodes with a single
+# parse (loads/unpack), without going through asdict's recursive copy. The JSON form is
+# the one the Unity server speaks; the packed form is a fixed-size little-endian record
+# for recordings, batches and shared memory.
+
+VECTOR3_RECORD = struct.Struct('<3d')  # x, y, z
+TRANSFORM_RECORD = struct.Struct('<6d')  # position x, y, z, rotation x, y, z
+COLOR_RECORD = struct.Struct('<4d')  # r, g, b, a
+GEOCOORDINATE_RECORD = struct.Struct('<3d')  # latitude, longitude, height_m
+
 
 class BaseDataclass:
 
@@ -16,11 +28,57 @@ class Vector3(BaseDataclass):
     y: float = 0
     z: float = 0
 
+    def to_dict(self) -> dict:
+        return {'x': self.x, 'y': self.y, 'z': self.z}
+
+    def dumps(self) -> str:
+        return orjson.dumps(self.to_dict()).decode()
+
+    def pack(self) -> bytes:
+        return VECTOR3_RECORD.pack(self.x, self.y, self.z)
+
+    @staticmethod
+    def from_dict(data: dict) -> Vector3:
+        return Vector3(data['x'], data['y'], data['z'])
+
+    @staticmethod
+    def loads(data: str) -> Vector3:
+        return Vector3.from_dict(orjson.loads(data))
+
+    @staticmethod
+    def unpack(data: bytes, offset: int = 0) -> Vector3:
+        return Vector3(*VECTOR3_RECORD.unpack_from(data, offset))
+
 @dataclass
 class Transform(BaseDataclass):
 
-    position: Vector3 = Vector3()
-    rotation: Vector3 = Vector3()
+    position: Vector3 = field(default_factory = Vector3)
+    rotation: Vector3 = field(default_factory = Vector3)
+
+    def to_dict(self) -> dict:
+        return {'position': self.position.to_dict(), 'rotation': self.rotation.to_dict()}
+
+    def dumps(self) -> str:
+        return orjson.dumps(self.to_dict()).decode()
+
+    def pack(self) -> bytes:
+
+        position, rotation = self.position, self.rotation
+        return TRANSFORM_RECORD.pack(position.x, position.y, position.z, rotation.x, rotation.y, rotation.z)
+
+    @staticmethod
+    def from_dict(data: dict) -> Transform:
+        return Transform(Vector3.from_dict(data['position']), Vector3.from_dict(data['rotation']))
+
+    @staticmethod
+    def loads(data: str) -> Transform:
+        return Transform.from_dict(orjson.loads(data))
+
+    @staticmethod
+    def unpack(data: bytes, offset: int = 0) -> Transform:
+
+        px, py, pz, rx, ry, rz = TRANSFORM_RECORD.unpack_from(data, offset)
+        return Transform(Vector3(px, py, pz), Vector3(rx, ry, rz))
 
 @dataclass
 class Color(BaseDataclass):
@@ -30,6 +88,27 @@ class Color(BaseDataclass):
     b: float = 1
     a: float = 1
 
+    def to_dict(self) -> dict:
+        return {'r': self.r, 'g': self.g, 'b': self.b, 'a': self.a}
+
+    def dumps(self) -> str:
+        return orjson.dumps(self.to_dict()).decode()
+
+    def pack(self) -> bytes:
+        return COLOR_RECORD.pack(self.r, self.g, self.b, self.a)
+
+    @staticmethod
+    def from_dict(data: dict) -> Color:
+        return Color(data['r'], data['g'], data['b'], data['a'])
+
+    @staticmethod
+    def loads(data: str) -> Color:
+        return Color.from_dict(orjson.loads(data))
+
+    @staticmethod
+    def unpack(data: bytes, offset: int = 0) -> Color:
+        return Color(*COLOR_RECORD.unpack_from(data, offset))
+
 
 @dataclass
 class GeoCoordinate(BaseDataclass):
@@ -38,15 +117,31 @@ class GeoCoordinate(BaseDataclass):
     longitude: float
     height_m: float
 
-    
-    def dumps(self) -> str:
-        data = {
+    def to_dict(self) -> dict:
+
+        return {
             "Longitude": self.longitude,
             "Latitude": self.latitude,
             "Height": self.height_m
         }
-        
-        return orjson.dumps(data).decode()
+
+    def dumps(self) -> str:
+        return orjson.dumps(self.to_dict()).decode()
+
+    def pack(self) -> bytes:
+        return GEOCOORDINATE_RECORD.pack(self.latitude, self.longitude, self.height_m)
+
+    @staticmethod
+    def from_dict(data: dict) -> GeoCoordinate:
+        return GeoCoordinate(data['Latitude'], data['Longitude'], data['Height'])
+
+    @staticmethod
+    def loads(data: str) -> GeoCoordinate:
+        return GeoCoordinate.from_dict(orjson.loads(data))
+
+    @staticmethod
+    def unpack(data: bytes, offset: int = 0) -> GeoCoordinate:
+        return GeoCoordinate(*GEOCOORDINATE_RECORD.unpack_from(data, offset))
     
 def context_required(function):
     
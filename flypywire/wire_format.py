@@ -0,0 +1,113 @@
+import struct
+from typing import List, Optional, Tuple
+
+
+class WireFormat:
+
+    JSON = 'json'
+    BINARY = 'binary'
+    DELTA = 'delta'
+    AUTO = 'auto'
+
+
+# Binary layout (little-endian):
+#   header  | magic, version, flags, timestamp, n_actors, names_len, extras_len
+#   names   | utf-8 actor names separated by NAME_SEPARATOR
+#   poses   | n_actors fixed-size records: name index + lat, lon, height, roll, pitch, yaw
+#   extras  | orjson side channel {actor_name: additional_data}, only for actors that carry any.
+#             Actors with a registered TelemetrySchema send [actor_type, [values...]] instead of a dict.
+
+BINARY_MAGIC = b'FPWB'
+BINARY_VERSION = 1
+NAME_SEPARATOR = b'\x00'
+
+HEADER = struct.Struct('<4sBBdIII')
+POSE_RECORD = struct.Struct('<I6d')
+
+# Header flags. Plain binary messages carry no flags; delta streams mark every
+# message as either a keyframe (full state) or a delta (changed actors only).
+FLAG_KEYFRAME = 1
+FLAG_DELTA = 2
+
+
+# Per-actor topic streams send one [topic, state] multipart message per actor (or
+# actor group), followed by a [FRAME_TOPIC, state] marker that carries the timestamp
+# and closes the frame. Topics end with a separator so prefix matching is exact.
+ACTOR_TOPIC_PREFIX = b'actor/'
+FRAME_TOPIC = b'frame/'
+
+
+def actor_topic(name: str) -> bytes:
+    return b''.join([ACTOR_TOPIC_PREFIX, name.encode(), b'/'])
+
+
+def is_binary(msg: bytes) -> bool:
+    return msg[:len(BINARY_MAGIC)] == BINARY_MAGIC
+
+
+def read_flags(msg: bytes) -> int:
+    return HEADER.unpack_from(msg)[2] if is_binary(msg) else 0
+
+
+def read_header(msg: bytes) -> Tuple[float, List[str], int, int]:
+
+    # Returns the timestamp, the actor names, the offset of the pose records and the length of the extras
+    magic, version, _, timestamp, n_actors, names_len, extras_len = HEADER.unpack_from(msg)
+
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError(f'Unsupported binary SimulationState (magic: {magic}, version: {version}).')
+
+    offset = HEADER.size
+    names = bytes(memoryview(msg)[offset: offset + names_len]).decode().split(NAME_SEPARATOR.decode()) if n_actors else []
+
+    return timestamp, names, offset + names_len, extras_len
+
+
+# Stamped streams append one STAMP frame to every message: the publisher's id (random per
+# Publisher instance, so a restarted publisher is a new source), a per-frame sequence number
+# and the publisher's time.monotonic() at send time. All messages of a per-actor topic frame
+# share the same sequence number.
+STAMP_MAGIC = b'FPWS'
+STAMP = struct.Struct('<4sIQd')  # magic, publisher_id, seq, send_time
+
+
+def stamp_frame(publisher_id: int, seq: int, send_time: float) -> bytes:
+    return STAMP.pack(STAMP_MAGIC, publisher_id, seq, send_time)
+
+
+def is_stamp(frame: bytes) -> bool:
+    return len(frame) == STAMP.size and frame[:len(STAMP_MAGIC)] == STAMP_MAGIC
+
+
+# The broker appends a REPLAY frame, numbered per new subscription, to the cached messages it
+# replays. XPUB cannot address a single subscriber, so a subscriber keeps only the first replay
+# it sees, and none once it receives live messages.
+REPLAY_MAGIC = b'FPWL'
+REPLAY = struct.Struct('<4sQ')  # magic, replay_id
+
+
+def replay_frame(replay_id: int) -> bytes:
+    return REPLAY.pack(REPLAY_MAGIC, replay_id)
+
+
+def is_replay(frame: bytes) -> bool:
+    return len(frame) == REPLAY.size and frame[:len(REPLAY_MAGIC)] == REPLAY_MAGIC
+
+
+def split_replay(frames: List[bytes]) -> Tuple[List[bytes], Optional[int]]:
+
+    last = frames[-1]
+    if len(frames) < 2 or not is_replay(last):
+        return frames, None
+
+    return frames[:-1], REPLAY.unpack(last)[1]
+
+
+def split_stamp(frames: List[bytes]) -> Tuple[List[bytes], Optional[Tuple[int, int, float]]]:
+
+    last = frames[-1]
+    if len(frames) < 2 or not is_stamp(last):
+        return frames, None
+
+    _, publisher_id, seq, send_time = STAMP.unpack(last)
+    return frames[:-1], (publisher_id, seq, send_time)
@@ -0,0 +1,173 @@
+import zmq
+import zmq.asyncio
+import logging
+import weakref
+from threading import Lock
+from typing import Dict, List, Optional
+
+# One zmq.Context per process, shared by Publisher, Subscriber, Client and Camera.
+# Socket options configured here are applied to every socket created afterwards.
+#
+# A socket must only be closed by the thread using it, so components pass themselves as
+# the owner of their sockets and terminate_context() calls their close(), which stops their
+# threads before closing the sockets, instead of closing the sockets from under them.
+
+_SOCKET_OPTIONS = {
+    'sndhwm': zmq.SNDHWM,
+    'rcvhwm': zmq.RCVHWM,
+    'linger': zmq.LINGER,
+    'tcp_keepalive': zmq.TCP_KEEPALIVE,
+    'tcp_keepalive_idle': zmq.TCP_KEEPALIVE_IDLE,
+    'tcp_keepalive_intvl': zmq.TCP_KEEPALIVE_INTVL,
+    'tcp_keepalive_cnt': zmq.TCP_KEEPALIVE_CNT,
+}
+
+_lock = Lock()
+_context: Optional[zmq.Context] = None
+_async_context: Optional[zmq.asyncio.Context] = None
+_io_threads = 1
+_socket_options: Dict[int, int] = {}
+_owners: 'weakref.WeakKeyDictionary[object, List[zmq.Socket]]' = weakref.WeakKeyDictionary()
+
+
+def configure_context(
+    io_threads: Optional[int] = None,
+    sndhwm: Optional[int] = None,
+    rcvhwm: Optional[int] = None,
+    linger: Optional[int] = None,
+    tcp_keepalive: Optional[int] = None,
+    tcp_keepalive_idle: Optional[int] = None,
+    tcp_keepalive_intvl: Optional[int] = None,
+    tcp_keepalive_cnt: Optional[int] = None) -> None:
+
+    global _io_threads
+
+    options = dict(
+        sndhwm = sndhwm,
+        rcvhwm = rcvhwm,
+        linger = linger,
+        tcp_keepalive = tcp_keepalive,
+        tcp_keepalive_idle = tcp_keepalive_idle,
+        tcp_keepalive_intvl = tcp_keepalive_intvl,
+        tcp_keepalive_cnt = tcp_keepalive_cnt)
+
+    with _lock:
+        for name, value in options.items():
+            if value is not None: _socket_options[_SOCKET_OPTIONS[name]] = value
+
+        if io_threads is not None:
+            # libzmq only honours IO_THREADS before the first socket is created
+            if _context is not None and io_threads != _io_threads:
+                logging.warning(msg = 'io_threads changed after the shared zmq.Context was created; terminate it first for the change to apply.')
+            _io_threads = io_threads
+
+        for context in (_context, _async_context):
+            if context is None: continue
+            for option, value in _socket_options.items(): context.setsockopt(option, value)
+
+
+def get_context() -> zmq.Context:
+
+    global _context
+
+    with _lock:
+        if _context is None or _context.closed:
+            _context = zmq.Context(io_threads = _io_threads)
+            for option, value in _socket_options.items(): _context.setsockopt(option, value)
+
+        return _context
+
+
+def _register(socket: zmq.Socket, owner: Optional[object]) -> zmq.Socket:
+
+    if owner is not None:
+        with _lock: _owners.setdefault(owner, []).append(socket)
+
+    return socket
+
+
+def _unregister(socket: zmq.Socket, owner: object) -> None:
+
+    with _lock:
+        sockets = _owners.get(owner)
+        if sockets is None: return
+
+        sockets[:] = [owned for owned in sockets if owned is not socket]
+        if not sockets: del _owners[owner]
+
+
+def create_socket(socket_type: int, owner: Optional[object] = None) -> zmq.Socket:
+    return _register(get_context().socket(socket_type), owner)
+
+
+def get_async_context() -> zmq.asyncio.Context:
+
+    global _async_context
+
+    context = get_context()
+
+    with _lock:
+        # asyncio sockets live on a shadow of the shared context, so they share its I/O threads
+        if _async_context is None or _async_context.underlying != context.underlying:
+            _async_context = zmq.asyncio.Context.shadow(context.underlying)
+            for option, value in _socket_options.items(): _async_context.setsockopt(option, value)
+
+        return _async_context
+
+
+def create_async_socket(socket_type: int, owner: Optional[object] = None) -> zmq.asyncio.Socket:
+    return _register(get_async_context().socket(socket_type), owner)
+
+
+def _has_open_sockets(owner: object) -> bool:
+    return any(not socket.closed for socket in _owners.get(owner, ()))
+
+
+def terminate_context(linger: Optional[int] = None) -> None:
+
+    global _context, _async_context
+
+    with _lock: owners = list(_owners.keys())
+
+    # Outside the lock: closing a component may create or close sockets of its own. Their sockets
+    # close with the linger set through configure_context(); linger here only applies to leftovers
+    for owner in owners:
+        if not _has_open_sockets(owner): continue
+
+        try:
+            owner.close()
+
+        except Exception as exc:
+            logging.warning(msg = f'Closing {owner} while terminating the zmq.Context failed: {exc!r}')
+
+    with _lock:
+        # Sockets created without an owner can only be closed from here; close them first if a thread still uses them
+        leftovers = [
+            socket for context in (_async_context, _context) if context is not None
+            for socket in list(getattr(context, '_sockets', None) or []) if not socket.closed]
+
+        if leftovers:
+            logging.warning(msg = f'Closing {len(leftovers)} socket(s) left open on the shared zmq.Context.')
+            for socket in leftovers: socket.close(linger = linger)
+
+        _async_context = None
+
+        if _context is not None and not _context.closed: _context.term()
+
+        _context = None
+
+
+class SharedContext:
+
+    def __init__(self, io_threads: Optional[int] = None, **socket_options):
+
+        self.io_threads = io_threads
+        self.socket_options = socket_options
+
+    def __enter__(self) -> zmq.Context:
+
+        configure_context(self.io_threads, **self.socket_options)
+        return get_context()
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        terminate_context()